@@ -107,6 +107,8 @@ if FRONTEND_URL not in CORS_ALLOWED_ORIGINS:
     CORS_ALLOWED_ORIGINS.append(FRONTEND_URL)
 
 CORS_ALLOW_CREDENTIALS = True
+# Lets the frontend see dashboard ETags (conditional requests get 304s)
+CORS_EXPOSE_HEADERS = ['ETag']
 
 # For development only - remove in production
 if DEBUG:
@@ -131,6 +133,9 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Transaction index INCLUDE columns only apply on PostgreSQL; SQLite just builds the keys
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
 # Custom user model
 AUTH_USER_MODEL = 'expenses.User'
 
@@ -143,5 +148,73 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
 # File upload limits
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB; larger uploads spool to disk
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
+
+# Statement size caps. CSVs are parsed in streamed batches, so memory does not
+# grow with file size; PDFs are still parsed whole.
+STATEMENT_MAX_CSV_SIZE = config('STATEMENT_MAX_CSV_SIZE', default=200 * 1024 * 1024, cast=int)  # 200MB
+STATEMENT_MAX_PDF_SIZE = config('STATEMENT_MAX_PDF_SIZE', default=10 * 1024 * 1024, cast=int)  # 10MB
+
+
+# Statement ingestion
+# Uploads wait here until a worker picks them up; 0 workers processes them inline
+STATEMENT_UPLOAD_DIR = MEDIA_ROOT / 'statements'
+STATEMENT_INGESTION_WORKERS = config('STATEMENT_INGESTION_WORKERS', default=2, cast=int)
+# Seconds without progress after which a claimed statement counts as abandoned
+# and is queued again; keep it above the slowest single parse (a large PDF)
+STATEMENT_INGESTION_STALE_AFTER = config('STATEMENT_INGESTION_STALE_AFTER', default=15 * 60, cast=int)
+# Seconds without progress after which a RUNNING recategorization job counts as
+# abandoned and can be resumed; keep it above the slowest single batch
+RECATEGORIZATION_STALE_AFTER = config('RECATEGORIZATION_STALE_AFTER', default=15 * 60, cast=int)
+# Processes used to extract pages of large PDFs in parallel (1 = serial)
+PDF_PARSER_WORKERS = config('PDF_PARSER_WORKERS', default=min(4, os.cpu_count() or 1), cast=int)
+# 'pymupdf' (fast text pass, pdfplumber only where it finds nothing) or 'pdfplumber'
+PDF_PARSER_BACKEND = config('PDF_PARSER_BACKEND', default='pymupdf')
+# Parsed rows of recently processed files, keyed by file digest, parser, PDF
+# backend and parser version, so reprocessing the same file skips parsing. Larger
+# statements are not kept. A cached row takes about 85 bytes, and local memory
+# holds up to MAX_ENTRIES x MAX_ROWS rows in every process: about 17MB by default.
+STATEMENT_PARSE_CACHE = 'statement_parses'
+STATEMENT_PARSE_CACHE_MAX_ROWS = config('STATEMENT_PARSE_CACHE_MAX_ROWS', default=10000, cast=int)
+# Normalized descriptions whose category each process remembers across uploads
+CATEGORIZER_CACHE_SIZE = config('CATEGORIZER_CACHE_SIZE', default=20000, cast=int)
+# Processes that score very large statements in parallel (1 = serial, the
+# default: opt in on hosts with spare cores), and the number of distinct uncached
+# descriptions below which scoring stays serial. Set the latter from the
+# crossover `manage.py benchmark categorizer-shards` reports on the host.
+CATEGORIZER_WORKERS = config('CATEGORIZER_WORKERS', default=1, cast=int)
+CATEGORIZER_PARALLEL_MIN_ROWS = config('CATEGORIZER_PARALLEL_MIN_ROWS', default=20000, cast=int)
+
+# Dashboards
+# Serve dashboard aggregates from SpendingRollup when the filters cover whole months
+DASHBOARD_USE_ROLLUPS = config('DASHBOARD_USE_ROLLUPS', default=True, cast=bool)
+
+# Dashboard responses are cached per user until their data changes. Local memory
+# is per process: with several server processes, use a shared backend (e.g.
+# django.core.cache.backends.filebased.FileBasedCache with a directory as
+# location) so an upload handled by one process invalidates the others.
+DASHBOARD_CACHE = 'dashboard'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        'BACKEND': config('DASHBOARD_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('DASHBOARD_CACHE_LOCATION', default='dashboard'),
+        'TIMEOUT': config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'statement_parses': {
+        'BACKEND': config('STATEMENT_PARSE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('STATEMENT_PARSE_CACHE_LOCATION', default='statement-parses'),
+        'TIMEOUT': config('STATEMENT_PARSE_CACHE_TIMEOUT', default=24 * 60 * 60, cast=int),
+        'OPTIONS': {'MAX_ENTRIES': config('STATEMENT_PARSE_CACHE_MAX_ENTRIES', default=20, cast=int)},
+    },
+}
+
+# Category changes reach other processes through a version kept in this cache
+# (shared like the dashboard one); each process looks at it at most every
+# CATEGORY_REGISTRY_CHECK_INTERVAL seconds, so that is how long they may lag
+CATEGORY_REGISTRY_CACHE = DASHBOARD_CACHE
+CATEGORY_REGISTRY_CHECK_INTERVAL = config('CATEGORY_REGISTRY_CHECK_INTERVAL', default=5, cast=float)
@@ -2,3 +2,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expense_explorer.settings')
 application = get_wsgi_application()
+
+# Resume statements queued or abandoned before this process started
+from expenses import ingestion  # noqa: E402
+ingestion.start()
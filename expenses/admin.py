@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Account, Statement, Transaction, Category, PasswordResetToken
+from .models import User, Account, Statement, Transaction, Category, PasswordResetToken, SpendingRollup, RecategorizationJob, MerchantRule, SpendingSummary
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -27,10 +27,10 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Statement)
 class StatementAdmin(admin.ModelAdmin):
-    list_display = ('user', 'account', 'file_name', 'file_type', 'currency', 'processed', 'uploaded_at')
-    list_filter = ('file_type', 'processed', 'uploaded_at', 'account')
+    list_display = ('user', 'account', 'file_name', 'file_type', 'currency', 'status', 'rows_inserted', 'uploaded_at')
+    list_filter = ('file_type', 'status', 'uploaded_at', 'account')
     search_fields = ('user__email', 'file_name', 'account__name')
-    readonly_fields = ('uploaded_at',)
+    readonly_fields = ('uploaded_at', 'started_at', 'finished_at')
     ordering = ('-uploaded_at',)
 
 @admin.register(Transaction)
@@ -49,3 +49,32 @@ class PasswordResetTokenAdmin(admin.ModelAdmin):
     search_fields = ('user__email', 'token')
     readonly_fields = ('created_at',)
     ordering = ('-created_at',)
+
+@admin.register(SpendingRollup)
+class SpendingRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'statement', 'category', 'month', 'weekday', 'total', 'count')
+    list_filter = ('category', 'month')
+    search_fields = ('user__email', 'statement__file_name')
+    ordering = ('-month',)
+
+@admin.register(RecategorizationJob)
+class RecategorizationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'rows_scanned', 'rows_changed', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('last_id', 'rows_scanned', 'rows_changed', 'error', 'created_at', 'started_at', 'finished_at')
+    ordering = ('-created_at',)
+
+@admin.register(MerchantRule)
+class MerchantRuleAdmin(admin.ModelAdmin):
+    list_display = ('merchant_key', 'user', 'category', 'updated_at')
+    list_filter = ('category',)
+    search_fields = ('merchant_key', 'user__email')
+    readonly_fields = ('created_at', 'updated_at')
+    ordering = ('merchant_key',)
+
+@admin.register(SpendingSummary)
+class SpendingSummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'statement', 'total', 'count', 'first_date', 'last_date', 'updated_at')
+    search_fields = ('user__email', 'statement__file_name')
+    readonly_fields = ('updated_at',)
+    ordering = ('-updated_at',)
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 class ExpensesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'expenses'
+
+    def ready(self):
+        # Connect the signal handlers that keep the category registry, the
+        # dashboard cache, the rollups and the spending summaries fresh, and
+        # remove uploads
+        from . import dashboard_cache, ingestion, registry, rollups, summaries  # noqa: F401
@@ -1,5 +1,232 @@
+import multiprocessing
 import re
-from .models import Category
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+from .models import Category, MerchantRule
+from .registry import category_registry
+from . import categorizer_workers
+
+# Standalone tokens that vary between otherwise identical descriptions: dates,
+# masked card numbers, #store ids and numbers of 3+ digits (shorter ones, like
+# "forever 21", can be part of keywords). Only whole tokens are removed, so the
+# word boundaries keywords are matched against stay the same.
+_NOISE = re.compile(
+    r'\b\d{1,4}[/.-]\d{1,2}(?:[/.-]\d{2,4})?\b'
+    r'|(?<![\w*])[x*]{2,}\d*(?!\w)'
+    r'|#\w*\d\w*'
+    r'|\b\d{3,}\b'
+)
+
+
+# Characters noise tokens are made of, besides the letters of store ids
+_NOISE_CHARS = frozenset('0123456789/.-x*#')
+
+# Store ids with letters in them: a keyword can start inside one
+_LETTERED_IDS = re.compile(r'#\w*[^\W\d]\w*')
+
+# Stands in for a dropped noise token in scoring keys: no keyword contains it,
+# and like the characters around any noise token it is not a word character
+_GAP = '\x00'
+
+
+def normalize_description(description):
+    """Lowercased description with noise tokens dropped and whitespace collapsed"""
+    return ' '.join(_NOISE.sub(' ', description.lower()).split())
+
+
+class CategoryCache:
+    """
+    Bounded LRU of scoring key (see ExpenseCategorizer.description_key) ->
+    Category, shared by the
+    categorizers of a process. Entries belong to one version of the category
+    registry: a categorizer built after a keyword change clears them, and one
+    built before it no longer reads or writes them.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys, version):
+        """Returns: dict of the cached keys -> Category (empty for an outdated version)"""
+        found = {}
+        with self._lock:
+            if version != self.version:
+                if self.version is not None and version < self.version:
+                    return found
+                self._entries.clear()
+                self.version = version
+            for key in keys:
+                category = self._entries.get(key)
+                if category is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = category
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items, version):
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries.update(items)
+            for key in items:
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.size,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+category_cache = CategoryCache(settings.CATEGORIZER_CACHE_SIZE)
+
+
+# Scoring processes shared by every categorizer of this process (see _shard_pool)
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def _shard_pool(workers, tables):
+    """
+    The process-wide scoring pool, started on first use and restarted when the
+    worker count or the keyword tables change. The keyword tables are sent
+    once, to the pool initializer, rather than with every shard.
+    tables: tuple of (category name, keywords tuple) in category load order
+    """
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool_key != (workers, tables):
+            if _pool is not None:
+                # Shards already submitted to the old pool still finish
+                _pool.shutdown(wait=False)
+            # spawn, not fork: the caller is usually a threaded web/ingestion worker
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=categorizer_workers.init_worker,
+                initargs=(tables,)
+            )
+            _pool_key = (workers, tables)
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the scoring processes, if any were started"""
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = _pool_key = None
+
+
+def _is_word_char(char):
+    """Mirror of the ``\\w`` class used by ``re`` for str patterns"""
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over every category keyword.
+
+    Finds all (possibly overlapping) keyword occurrences in a single pass
+    over the description, so scoring no longer runs one regex per keyword.
+    """
+
+    def __init__(self, keywords):
+        """
+        keywords: iterable of (keyword, payload) pairs, keyword already lowercased
+        """
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.empty = []
+
+        for keyword, payload in keywords:
+            if not keyword:
+                self.empty.append((keyword, payload))
+                continue
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = next_state
+                state = next_state
+            self.output[state].append((keyword, payload))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def scan(self, text):
+        """
+        Scan text once and classify every keyword it contains.
+        Returns: dict of keyword -> (payload, bounded) where bounded is True
+        when at least one occurrence sits between word boundaries.
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+        found = {}
+        state = 0
+        length = len(text)
+
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword, payload in output[state]:
+                hit = found.get(keyword)
+                if hit and hit[1]:
+                    continue
+                start = end - len(keyword)
+                before = _is_word_char(text[start - 1]) if start > 0 else False
+                after = _is_word_char(text[end]) if end < length else False
+                bounded = (
+                    before != _is_word_char(keyword[0])
+                    and after != _is_word_char(keyword[-1])
+                )
+                found[keyword] = (payload, bounded)
+
+        if self.empty:
+            # ``\b\b`` matches an empty keyword wherever the text has a word character
+            bounded = any(_is_word_char(char) for char in text)
+            for keyword, payload in self.empty:
+                found[keyword] = (payload, bounded)
+
+        return found
+
 
 class ExpenseCategorizer:
     """
@@ -72,54 +299,200 @@ class ExpenseCategorizer:
         ]
     }
 
-    def __init__(self):
+    EXACT_SCORE = 100
+    WORD_SCORE = 10
+    SUBSTRING_SCORE = 5
+
+    def __init__(self, user_id=None, workers=None):
+        """
+        user_id: also apply this user's merchant rules (global ones always apply)
+        workers: processes that score large bulk requests (default
+        settings.CATEGORIZER_WORKERS; 1 = serial). The processes are shared
+        by every categorizer of this process and outlive this one.
+        """
         self.categories = {}
+        # Read before loading: if keywords change in between, cached results are
+        # tagged with the older version and get dropped
+        self.version = category_registry.version
         self._load_categories()
+        self.matcher = self._build_matcher()
+        self.rules = self._load_rules(user_id)
+        self.workers = settings.CATEGORIZER_WORKERS if workers is None else workers
+
+    @classmethod
+    def from_keywords(cls, tables):
+        """
+        Scoring-only categorizer that makes no queries, for pool workers.
+        Its categories have no instance: use score_names, not score_texts.
+        tables: list of (category name, keywords) in category load order
+        """
+        categorizer = cls.__new__(cls)
+        categorizer.categories = {
+            cat_name: {'instance': None, 'keywords': keywords} for cat_name, keywords in tables
+        }
+        categorizer.matcher = categorizer._build_matcher()
+        categorizer.rules = {}
+        categorizer.workers = 1
+        return categorizer
 
     def _load_categories(self):
-        """Load categories from database"""
-        for cat in Category.objects.all():
+        """Load categories from the process-wide registry (no query once it is warm)"""
+        for cat in category_registry.all():
             keywords = cat.keywords if cat.keywords else self.CATEGORY_KEYWORDS.get(cat.name, [])
             self.categories[cat.name] = {
                 'instance': cat,
                 'keywords': keywords
             }
 
-    def categorize(self, description):
+    def _load_rules(self, user_id):
         """
-        Categorize a transaction based on its description
-        Returns: Category instance
+        Load merchant rules with one query, the user's overriding global ones
+        Returns: dict of merchant key -> Category instance
         """
-        if not description:
-            return self._get_uncategorized()
+        rules = MerchantRule.objects.filter(user__isnull=True)
+        if user_id is not None:
+            rules = rules | MerchantRule.objects.filter(user_id=user_id)
+        loaded = {}
+        for merchant_key, category_id in rules.order_by(F('user_id').asc(nulls_first=True)).values_list(
+            'merchant_key', 'category_id'
+        ):
+            category = category_registry.by_id(category_id)
+            if category:
+                loaded[merchant_key] = category
+        return loaded
 
-        description_lower = description.lower()
-        
-        category_scores = {}
+    def _build_matcher(self):
+        """
+        Build one keyword automaton for all categories.
+        Each lowercased keyword carries {category name: occurrences} so a
+        keyword listed twice still scores twice, as before.
+        """
+        weights = {}
         for cat_name, cat_data in self.categories.items():
             if cat_name == 'UNCATEGORIZED':
                 continue
-            
-            score = 0
-            keywords = cat_data['keywords']
-            
-            for keyword in keywords:
-                keyword_lower = keyword.lower()
-                if keyword_lower == description_lower:
-                    score += 100
-                elif re.search(rf'\b{re.escape(keyword_lower)}\b', description_lower):
-                    score += 10
-                elif keyword_lower in description_lower:
-                    score += 5
-            
-            if score > 0:
-                category_scores[cat_name] = score
-        
-        if category_scores:
-            best_category = max(category_scores, key=category_scores.get)
-            return self.categories[best_category]['instance']
-        
-        return self._get_uncategorized()
+            for keyword in cat_data['keywords']:
+                per_category = weights.setdefault(keyword.lower(), {})
+                per_category[cat_name] = per_category.get(cat_name, 0) + 1
+
+        # Score matrix layout for score_texts: one column per category, in load order
+        self.columns = [cat_name for cat_name in self.categories if cat_name != 'UNCATEGORIZED']
+        column = {cat_name: index for index, cat_name in enumerate(self.columns)}
+        self.keyword_columns = {
+            keyword: [(column[cat_name], occurrences) for cat_name, occurrences in per_category.items()]
+            for keyword, per_category in weights.items()
+        }
+
+        # Keywords that could overlap a noise token, by token character; ones
+        # that start or end with a non-word character (their word boundary
+        # could be the token) or are empty count for every token
+        prone = {char: [] for char in _NOISE_CHARS}
+        self.edge_prone = False
+        for keyword in weights:
+            if not keyword or not _is_word_char(keyword[0]) or not _is_word_char(keyword[-1]):
+                self.edge_prone = True
+            for char in _NOISE_CHARS.intersection(keyword):
+                prone[char].append(keyword)
+        self.noise_prone = {
+            char: re.compile('|'.join(map(re.escape, keywords))) for char, keywords in prone.items() if keywords
+        }
+        self.longest_keyword = max(map(len, weights), default=0)
+        return KeywordMatcher(weights.items())
+
+    def description_key(self, description):
+        """
+        Text a description is scored and cached under. Noise tokens (see
+        normalize_description) are replaced with a gap character, so
+        descriptions that differ only in dates, card or reference numbers
+        share a key. A key with a gap never equals a keyword (no exact-match
+        bonus) and no keyword occurrence can span one, so it scores exactly
+        like each raw description, unless a keyword could have overlapped a
+        dropped token: then the lowercased description itself is the key.
+        """
+        lowered = description.lower()
+        tokens = _NOISE.findall(lowered)
+        if not tokens:
+            return lowered
+        if self.edge_prone:
+            return lowered
+        for char in _NOISE_CHARS.intersection(''.join(tokens)):
+            pattern = self.noise_prone.get(char)
+            if pattern and pattern.search(lowered):
+                return lowered
+        for store_id in _LETTERED_IDS.finditer(lowered):
+            # A keyword starting inside the id may run on past its end
+            if self.matcher.scan(lowered[store_id.start():store_id.end() + self.longest_keyword]):
+                return lowered
+        return _NOISE.sub(_GAP, lowered)
+
+    def categorize(self, description):
+        """
+        Categorize a transaction based on its description
+        Returns: Category instance
+        """
+        return self.categorize_bulk([{'description': description}])[0]
+
+    def score_names(self, texts, chunk_size=50000):
+        """
+        Score many lowercased texts at once. One automaton scan per text fills
+        a (texts x categories) score matrix and argmax picks each row's best
+        column; columns follow category load order and argmax takes the first
+        maximum, so ties go to the first category, as in legacy scoring.
+        Returns: list of category names (None for uncategorized)
+        """
+        names = []
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            rows, cols, points = [], [], []
+            for row, text in enumerate(chunk):
+                if not text:
+                    continue
+                for keyword, (_, bounded) in self.matcher.scan(text).items():
+                    if keyword == text:
+                        value = self.EXACT_SCORE
+                    elif bounded:
+                        value = self.WORD_SCORE
+                    else:
+                        value = self.SUBSTRING_SCORE
+                    for col, occurrences in self.keyword_columns[keyword]:
+                        rows.append(row)
+                        cols.append(col)
+                        points.append(value * occurrences)
+
+            scores = np.zeros((len(chunk), len(self.columns) or 1), dtype=np.int64)
+            np.add.at(scores, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), points)
+            best = scores.argmax(axis=1)
+            matched = scores[np.arange(len(chunk)), best] > 0
+            names.extend(
+                self.columns[col] if found else None for col, found in zip(best.tolist(), matched.tolist())
+            )
+        return names
+
+    def score_texts(self, texts):
+        """
+        score_names as Category instances. With more than one worker and at
+        least settings.CATEGORIZER_PARALLEL_MIN_ROWS texts, the texts are split
+        into one contiguous shard per worker process and the names gathered
+        back in order.
+        Returns: list of Category instances
+        """
+        names = None
+        if self.workers > 1 and len(texts) >= settings.CATEGORIZER_PARALLEL_MIN_ROWS:
+            step = -(-len(texts) // self.workers)
+            shards = [texts[start:start + step] for start in range(0, len(texts), step)]
+            tables = tuple(
+                (cat_name, tuple(cat_data['keywords'])) for cat_name, cat_data in self.categories.items()
+            )
+            try:
+                pool = _shard_pool(self.workers, tables)
+                names = [name for shard in pool.map(categorizer_workers.score_shard, shards) for name in shard]
+            except RuntimeError:
+                # Another categorizer with newer keywords restarted the pool
+                # just as this one was about to use it
+                names = None
+        if names is None:
+            names = self.score_names(texts)
+        return [self.categories[name]['instance'] if name else self._get_uncategorized() for name in names]
 
     def _get_uncategorized(self):
         """Return uncategorized category"""
@@ -129,8 +502,26 @@ class ExpenseCategorizer:
 
     def categorize_bulk(self, transactions):
         """
-        Categorize multiple transactions efficiently
+        Categorize multiple transactions efficiently.
+        Merchant rules are looked up first by normalized description (see
+        normalize_description), then each remaining distinct scoring key (see
+        description_key) is scored once, unless the process-wide cache has it.
         transactions: list of dicts with 'description' key
         Returns: list of Category instances
         """
-        return [self.categorize(t.get('description', '')) for t in transactions]
\ No newline at end of file
+        descriptions = [t.get('description') or '' for t in transactions]
+        merchant_keys = [normalize_description(description) for description in descriptions]
+        keys = [
+            None if merchant_key in self.rules else self.description_key(description)
+            for description, merchant_key in zip(descriptions, merchant_keys)
+        ]
+        unique = [key for key in dict.fromkeys(keys) if key is not None]
+        results = category_cache.get_many(unique, self.version)
+        missing = [key for key in unique if key not in results]
+        scored = dict(zip(missing, self.score_texts(missing)))
+        category_cache.set_many(scored, self.version)
+        results.update(scored)
+        return [
+            results[key] if key is not None else self.rules[merchant_key]
+            for key, merchant_key in zip(keys, merchant_keys)
+        ]
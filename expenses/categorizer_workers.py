@@ -0,0 +1,29 @@
+"""
+Process-pool side of ExpenseCategorizer's sharded scoring.
+
+Kept apart from categorizer.py, which imports the models: spawned workers
+import this module first and only load the categorizer once Django is set up.
+"""
+import django
+
+# Scoring-only categorizer of this worker process, built by init_worker
+_scorer = None
+
+
+def init_worker(tables):
+    """
+    Pool initializer: build the keyword automaton once per worker
+    tables: (category name, keywords) pairs in category load order
+    """
+    global _scorer
+    django.setup()
+    from .categorizer import ExpenseCategorizer
+    _scorer = ExpenseCategorizer.from_keywords(tables)
+
+
+def score_shard(texts):
+    """
+    Process-pool task: score one shard of lowercased texts
+    Returns: list of category names (None for uncategorized), in input order
+    """
+    return _scorer.score_names(texts)
@@ -0,0 +1,290 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.db.models.functions import Round
+from django.utils import timezone
+from .models import Statement, Transaction
+from .registry import category_registry
+from .rollups import SpendingSource
+from . import summaries
+
+DAY_NAMES = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
+
+# Saturday and Sunday in ExtractWeekDay / __week_day numbering (1=Sunday)
+WEEKEND_DAYS = [1, 7]
+
+# Categories left out of the summary's category count
+UNCOUNTED_CATEGORIES = ['INCOME', 'UNCATEGORIZED']
+
+
+class Dashboard:
+    """
+    Every dashboard panel for one user and statement_id/start_date/end_date filters.
+
+    The summary, breakdown, top categories and weekday panels are all derived in
+    Python from a single query grouped by (category, month, weekday), and the
+    spending trend reuses it when no date filter is set. Panels are computed on
+    first use, so the single-panel endpoints only pay for what they return.
+    """
+
+    PANELS = ['summary', 'top_categories', 'spending_trend', 'spending_by_weekday',
+              'category_breakdown', 'recommendations']
+
+    def __init__(self, user, statement_id=None, start_date=None, end_date=None):
+        self.user = user
+        self.statement_id = statement_id
+        self.source = SpendingSource(user, statement_id, start_date, end_date)
+        self.dated = bool(start_date or end_date)
+        self._groups = None
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        return cls(
+            request.user,
+            statement_id=params.get('statement_id'),
+            start_date=params.get('start_date'),
+            end_date=params.get('end_date')
+        )
+
+    def as_dict(self):
+        return {panel: getattr(self, panel)() for panel in self.PANELS}
+
+    @staticmethod
+    def _group(source):
+        return list(source.queryset.values(
+            'category_id', 'category__name', period=source.month, day=source.weekday
+        ).annotate(total=source.total, count=source.count).order_by())
+
+    @property
+    def groups(self):
+        """Rows of (category_id, category__name, period, day, total, count) for the filters"""
+        if self._groups is None:
+            self._groups = self._group(self.source)
+        return self._groups
+
+    def _by_category(self):
+        """Returns: list of {'id', 'name', 'total', 'count'} for named categories, largest first"""
+        totals = {}
+        for row in self.groups:
+            if not row['category__name']:
+                continue
+            item = totals.setdefault(row['category_id'], {
+                'id': row['category_id'], 'name': row['category__name'], 'total': Decimal('0.00'), 'count': 0
+            })
+            item['total'] += row['total']
+            item['count'] += row['count']
+        return sorted(totals.values(), key=lambda item: item['total'], reverse=True)
+
+    def summary(self):
+        # Without a date filter, the running totals of the statement (or of all
+        # the user's statements) answer with a single row
+        if settings.DASHBOARD_USE_ROLLUPS and not self.dated:
+            record = summaries.get(self.user, self.statement_id)
+            if record and record.count:
+                categories = [category_registry.by_id(int(key)) if key else None for key in record.category_counts]
+                return {
+                    'total_spending': float(record.total),
+                    'category_count': sum(
+                        1 for category in categories if not category or category.name not in UNCOUNTED_CATEGORIES
+                    ),
+                    'transaction_count': record.count,
+                    'currency': record.currency
+                }
+
+        total_spending = sum((row['total'] for row in self.groups), Decimal('0.00'))
+        transaction_count = sum(row['count'] for row in self.groups)
+        category_count = len({
+            row['category_id'] for row in self.groups if row['category__name'] not in UNCOUNTED_CATEGORIES
+        })
+
+        # 🔥 GET CURRENCY FROM STATEMENT OR MOST TRANSACTIONS
+        currency = 'USD'  # default
+        if self.statement_id:
+            try:
+                currency = Statement.objects.get(id=self.statement_id, user=self.user).currency
+            except Statement.DoesNotExist:
+                pass
+        elif self.groups:
+            # Like SpendingSummary.currency: most transactions, alphabetically first on a tie
+            currency = self.source.transactions.values('currency').annotate(
+                count=Count('id')
+            ).order_by('-count', 'currency')[0]['currency']
+
+        return {
+            'total_spending': float(total_spending),
+            'category_count': category_count,
+            'transaction_count': transaction_count,
+            'currency': currency  # 🔥 DYNAMIC CURRENCY
+        }
+
+    def category_breakdown(self):
+        categories = []
+        for item in self._by_category():
+            categories.append({
+                'id': item['id'],
+                'name': item['name'],
+                'display_name': category_registry.display_name(item['name']),
+                'total': float(item['total']),
+                'count': item['count']
+            })
+        return categories
+
+    def top_categories(self):
+        formatted = []
+        for item in self._by_category():
+            formatted.append({
+                'name': category_registry.display_name(item['name']),
+                'total': float(item['total'])
+            })
+        return {'top_5': formatted[:5], 'lowest_5': formatted[-5:] if len(formatted) > 5 else []}
+
+    def spending_trend(self):
+        # The trend covers the statement's full history, whatever the date filter
+        if self.dated:
+            groups = self._group(SpendingSource(self.user, self.statement_id))
+        else:
+            groups = self.groups
+
+        monthly = defaultdict(Decimal)
+        for row in groups:
+            monthly[row['period']] += row['total']
+
+        # 🔥 Only return actual months with transactions
+        return [
+            {'month': month.strftime('%b %Y'), 'total': float(monthly[month])}
+            for month in sorted(monthly)
+        ]
+
+    def spending_by_weekday(self):
+        weekday_map = {i + 1: DAY_NAMES[i] for i in range(7)}
+        totals = defaultdict(Decimal)
+        for row in self.groups:
+            totals[row['day']] += row['total']
+
+        result = {day: 0.0 for day in DAY_NAMES}
+        for weekday, total in totals.items():
+            day_name = weekday_map.get(weekday)
+            if day_name:
+                result[day_name] = float(total)
+
+        return [{'day': day, 'total': result[day]} for day in DAY_NAMES]
+
+    def recommendations(self):
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=90)
+
+        transactions = Transaction.objects.filter(user=self.user, date__gte=start_date, date__lte=end_date)
+        if self.statement_id:
+            transactions = transactions.filter(statement_id=self.statement_id)
+
+        # One grouped query; everything below is derived from its rows
+        groups = list(transactions.values('category__name').annotate(
+            total=Sum('amount'),
+            count=Count('id'),
+            avg=Avg('amount'),
+            weekend=Round(Sum('amount', filter=Q(date__week_day__in=WEEKEND_DAYS)), 2),
+            earliest=Min('date'),
+            latest=Max('date')
+        ).order_by())
+
+        if not groups:
+            return {
+                'potential_savings': 0,
+                'budget_optimization': [],
+                'spending_pattern': 'No data available yet.'
+            }
+
+        # Category breakdown
+        category_spending = [item for item in groups if item['category__name'] != 'INCOME']
+
+        total_spending = sum(item['total'] for item in category_spending)
+
+        # Calculate insights
+        budget_optimization = []
+        high_spend_categories = []
+
+        for cat in category_spending:
+            if cat['category__name']:
+                cat_name = category_registry.display_name(cat['category__name'])
+            else:
+                # Transactions whose category was deleted
+                cat_name = 'Uncategorized'
+            percentage = (cat['total'] / total_spending * 100) if total_spending > 0 else 0
+
+            # High spending categories (>20% of total)
+            if percentage > 20:
+                high_spend_categories.append(cat_name)
+                budget_optimization.append({
+                    'category': cat_name,
+                    'suggestion': f'Accounts for {percentage:.1f}% of spending. Consider setting a budget limit.'
+                })
+
+            # Frequent small transactions
+            if cat['count'] > 10 and cat['avg'] < 50:
+                budget_optimization.append({
+                    'category': cat_name,
+                    'suggestion': f'{cat["count"]} small transactions averaging ${cat["avg"]:.2f}. Consider consolidating purchases.'
+                })
+
+            # High average transaction
+            if cat['avg'] > 200:
+                budget_optimization.append({
+                    'category': cat_name,
+                    'suggestion': f'Average transaction is ${cat["avg"]:.2f}. Look for bulk discounts or alternatives.'
+                })
+
+        # Potential savings calculation
+        potential_savings = 0
+        for cat in category_spending:
+            percentage = (cat['total'] / total_spending * 100) if total_spending > 0 else 0
+            if percentage > 15:
+                potential_savings += cat['total'] * Decimal('0.10')  # 10% reduction potential
+
+        # Spending pattern analysis (over all transactions, income included)
+        transaction_count = sum(item['count'] for item in groups)
+        date_range = {
+            'earliest': min(item['earliest'] for item in groups),
+            'latest': max(item['latest'] for item in groups)
+        }
+
+        if date_range['earliest'] and date_range['latest']:
+            days_span = (date_range['latest'] - date_range['earliest']).days + 1
+            avg_daily_spending = total_spending / days_span if days_span > 0 else 0
+            avg_transaction_size = total_spending / transaction_count if transaction_count > 0 else 0
+
+            # Weekday vs Weekend spending
+            weekend_total = sum((item['weekend'] or Decimal('0.00') for item in groups), Decimal('0.00'))
+
+            weekend_percentage = (weekend_total / total_spending * 100) if total_spending > 0 else 0
+
+            spending_pattern = f"You made {transaction_count} transactions over {days_span} days, averaging ${avg_daily_spending:.2f}/day. "
+            spending_pattern += f"Your average transaction is ${avg_transaction_size:.2f}. "
+
+            if weekend_percentage > 40:
+                spending_pattern += f"Weekend spending is {weekend_percentage:.1f}% of total - consider meal planning and entertainment budgets. "
+
+            if high_spend_categories:
+                spending_pattern += f"Top focus areas: {', '.join(high_spend_categories[:2])}."
+        else:
+            spending_pattern = "Insufficient data for pattern analysis."
+
+        # Additional smart tips
+        if not budget_optimization:
+            budget_optimization.append({
+                'category': 'Overall',
+                'suggestion': 'Your spending is well-distributed across categories. Keep tracking!'
+            })
+
+        # Limit to top 5 recommendations
+        budget_optimization = budget_optimization[:5]
+
+        return {
+            'potential_savings': float(potential_savings),
+            'budget_optimization': budget_optimization,
+            'spending_pattern': spending_pattern,
+            'total_transactions': transaction_count,
+            'average_transaction': float(total_spending / transaction_count) if transaction_count > 0 else 0
+        }
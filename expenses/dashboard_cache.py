@@ -0,0 +1,124 @@
+import functools
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from .models import Statement
+
+_stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.DASHBOARD_CACHE]
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats():
+    """Hit/miss counters of this process since start (or the last reset)"""
+    with _stats_lock:
+        counters = dict(_stats)
+    lookups = counters['hits'] + counters['misses'] + counters['not_modified']
+    counters['hit_rate'] = (counters['hits'] + counters['not_modified']) / lookups if lookups else 0.0
+    return counters
+
+
+def reset_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def _version_key(user_id):
+    return f'dashboard:version:{user_id}'
+
+
+def user_version(user_id):
+    """
+    Current dashboard version of a user. Versions start from the clock rather
+    than 1, so a counter evicted from the cache never comes back as a value
+    that old entries were stored under.
+    """
+    cache = get_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached dashboard response of a user"""
+    cache = get_cache()
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+@receiver(post_save, sender=Statement, dispatch_uid='dashboard_cache_statement_save')
+def _statement_saved(sender, instance, created, **kwargs):
+    if created:
+        bump_user_version(instance.user_id)
+
+
+@receiver(post_delete, sender=Statement, dispatch_uid='dashboard_cache_statement_delete')
+def _statement_deleted(sender, instance, **kwargs):
+    bump_user_version(instance.user_id)
+
+
+def cache_dashboard(view):
+    """
+    Cache a dashboard view's response data per user and query string.
+
+    Entries are keyed by the user's version (bumped on statement create/delete
+    and transaction inserts, see bump_user_version) and today's date, since
+    recommendations look at the last 90 days. The same parts make up the ETag,
+    so If-None-Match is answered with 304 without touching the cache.
+    Goes below @api_view/@permission_classes.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        user_id = request.user.pk
+        params = sorted(
+            (name, value) for name, values in request.query_params.lists() for value in values if value
+        )
+        fingerprint = hashlib.sha1(repr((
+            view.__name__, user_id, user_version(user_id), timezone.now().date().isoformat(), params
+        )).encode()).hexdigest()
+        etag = f'"{fingerprint}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        client_etags = {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}
+        if etag in client_etags or '*' in client_etags:
+            _record('not_modified')
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cache = get_cache()
+        key = f'dashboard:{fingerprint}'
+        data = cache.get(key)
+        if data is not None:
+            _record('hits')
+            return Response(data, headers=headers)
+
+        _record('misses')
+        response = view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data)
+            for name, value in headers.items():
+                response[name] = value
+        return response
+
+    return wrapper
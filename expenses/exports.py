@@ -0,0 +1,69 @@
+import csv
+import json
+from .registry import category_registry
+
+COLUMNS = ['id', 'date', 'description', 'amount', 'currency', 'category']
+
+# Rows fetched per database round trip, and written per chunk of the response
+CHUNK_SIZE = 2000
+
+
+def _rows(queryset, chunk_size):
+    """(id, date, description, amount, currency, category display name) tuples, no model instances"""
+    values = queryset.order_by('-date', '-id').values_list(
+        'id', 'date', 'description', 'amount', 'currency', 'category__name'
+    )
+    display_name = category_registry.display_name
+    for pk, date, description, amount, currency, category in values.iterator(chunk_size=chunk_size):
+        yield pk, date.isoformat(), description, str(amount), currency, display_name(category) if category else ''
+
+
+class _Buffer:
+    """File-like sink that hands back what csv.writer writes to it"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def drain(self):
+        text = ''.join(self.parts)
+        self.parts.clear()
+        return text
+
+
+def csv_stream(queryset, chunk_size=CHUNK_SIZE):
+    """Yields the transactions as CSV, a header line then one chunk per `chunk_size` rows"""
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield buffer.drain()
+
+    pending = 0
+    for row in _rows(queryset, chunk_size):
+        writer.writerow(row)
+        pending += 1
+        if pending == chunk_size:
+            yield buffer.drain()
+            pending = 0
+    if pending:
+        yield buffer.drain()
+
+
+def ndjson_stream(queryset, chunk_size=CHUNK_SIZE):
+    """Yields the transactions as newline-delimited JSON objects, `chunk_size` lines at a time"""
+    lines = []
+    for row in _rows(queryset, chunk_size):
+        lines.append(json.dumps(dict(zip(COLUMNS, row))))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines.clear()
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+STREAMS = {
+    'csv': csv_stream,
+    'ndjson': ndjson_stream,
+}
@@ -0,0 +1,378 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Statement, Transaction, transaction_fingerprint
+from .parsers import CSVParser, PDFParser
+from .categorizer import ExpenseCategorizer, normalize_description
+from . import dashboard_cache, rollups, summaries
+
+logger = logging.getLogger(__name__)
+
+# Rows parsed, categorized and inserted per step (and per progress update)
+BATCH_SIZE = 1000
+
+# Rows categorized together when the categorizer has worker processes, so
+# large statements reach CATEGORIZER_PARALLEL_MIN_ROWS and get sharded
+CATEGORIZE_WINDOW = 50000
+
+# Statuses of a statement some worker has claimed
+IN_PROGRESS = ('PARSING', 'CATEGORIZING', 'INSERTING')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Lazily start the in-process worker pool shared by all requests"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.STATEMENT_INGESTION_WORKERS,
+                thread_name_prefix='statement-ingestion'
+            )
+        return _executor
+
+
+def enqueue(statement):
+    """
+    Queue a PENDING statement for processing.
+    The statement row itself is the queue entry; the pool is only told to look
+    at it once the row is committed. With STATEMENT_INGESTION_WORKERS = 0 the
+    work runs inline instead.
+    """
+    if settings.STATEMENT_INGESTION_WORKERS <= 0:
+        process_statement(statement.id)
+        return
+    transaction.on_commit(lambda: get_executor().submit(run_job, statement.id))
+
+
+def start():
+    """
+    Worker process start-up: let the pool pick up statements a previous
+    process left queued or abandoned halfway
+    """
+    if settings.STATEMENT_INGESTION_WORKERS > 0:
+        get_executor().submit(drain)
+
+
+def run_job(statement_id):
+    """Pool entry point: worker threads manage their own DB connections"""
+    close_old_connections()
+    try:
+        process_statement(statement_id)
+        # Every finished job also sweeps for claims other processes abandoned
+        if reset_stale():
+            _drain()
+    except Exception:
+        logger.exception('Statement %s ingestion crashed', statement_id)
+    finally:
+        close_old_connections()
+
+
+def drain():
+    """Pool entry point: reset stale claims, then process PENDING statements until none is left"""
+    close_old_connections()
+    try:
+        reset_stale()
+        _drain()
+    except Exception:
+        logger.exception('Statement queue drain crashed')
+    finally:
+        close_old_connections()
+
+
+def _drain():
+    while True:
+        statement = claim_next()
+        if statement is None:
+            return
+        process_statement(statement=statement)
+
+
+class ClaimLost(Exception):
+    """The statement was deleted, or its claim reset as stale, while being processed"""
+
+    def __init__(self, statement):
+        super().__init__(f'Statement {statement.pk} is no longer claimed by this worker')
+
+
+def claim(statement_id):
+    """
+    Claim a PENDING statement for this worker.
+    Returns: Statement instance, or None if it is gone or already claimed
+    """
+    try:
+        statement = Statement.objects.get(pk=statement_id)
+    except Statement.DoesNotExist:
+        return None
+    if statement.status != 'PENDING':
+        return None
+    now = timezone.now()
+    if not statement.transition('PARSING', started_at=now, heartbeat_at=now):
+        return None
+    return statement
+
+
+def claim_next():
+    """Claim the oldest PENDING statement, skipping ones other workers win"""
+    pending = Statement.objects.filter(status='PENDING').order_by('uploaded_at').values_list('id', flat=True)
+    for statement_id in pending[:50]:
+        statement = claim(statement_id)
+        if statement:
+            return statement
+    return None
+
+
+def stale_claims():
+    """
+    Claimed statements whose worker has not reported progress for
+    STATEMENT_INGESTION_STALE_AFTER seconds: it crashed or was restarted
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.STATEMENT_INGESTION_STALE_AFTER)
+    return Statement.objects.filter(status__in=IN_PROGRESS).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+
+
+def reset_stale():
+    """
+    Undo what abandoned workers inserted and put their statements back in the
+    queue. The reset re-checks staleness in its UPDATE, so a worker that
+    reports progress in the meantime keeps its claim; one that does so
+    afterwards finds the claim gone (ClaimLost).
+    Returns: number of statements reset
+    """
+    reset = 0
+    for statement in stale_claims():
+        with transaction.atomic():
+            updated = stale_claims().filter(pk=statement.pk, started_at=statement.started_at).update(
+                status='PENDING', started_at=None, heartbeat_at=None,
+                rows_parsed=0, rows_categorized=0, rows_inserted=0, rows_duplicate=0
+            )
+            if not updated:
+                continue
+            Transaction.objects.filter(statement_id=statement.pk).delete()
+            rollups.remove(statement)
+            summaries.remove(statement)
+        dashboard_cache.bump_user_version(statement.user_id)
+        logger.warning('Statement %s was abandoned in %s, queued again', statement.pk, statement.status)
+        reset += 1
+    return reset
+
+
+def _set_progress(statement, **counters):
+    """Record progress and a heartbeat, as long as this worker still holds the claim"""
+    counters['heartbeat_at'] = timezone.now()
+    updated = Statement.objects.filter(
+        pk=statement.pk, status=statement.status, started_at=statement.started_at
+    ).update(**counters)
+    if not updated:
+        raise ClaimLost(statement)
+    for name, value in counters.items():
+        setattr(statement, name, value)
+
+
+def _parse_cache_key(statement, parser):
+    # PDF backends extract text differently, so their rows are kept apart
+    backend = getattr(parser, 'backend', '')
+    return f'statement-parse:{statement.file_digest}:{type(parser).__name__}:{backend}:{parser.VERSION}'
+
+
+def parsed_batches(statement, parser):
+    """
+    parser.parse_batches() of the statement's file, through the parse cache.
+    A file parsed to the end is cached by content digest, parser and version,
+    so processing the same file again (e.g. a re-upload after the first one
+    was deleted) skips parsing.
+    """
+    if not statement.file_digest:
+        yield from parser.parse_batches(statement.file_path, BATCH_SIZE)
+        return
+
+    cache = caches[settings.STATEMENT_PARSE_CACHE]
+    key = _parse_cache_key(statement, parser)
+    rows = cache.get(key)
+    if rows is not None:
+        for start in range(0, len(rows), BATCH_SIZE):
+            yield rows[start:start + BATCH_SIZE]
+        return
+
+    rows = []
+    for batch in parser.parse_batches(statement.file_path, BATCH_SIZE):
+        if rows is not None:
+            rows.extend(batch)
+            if len(rows) > settings.STATEMENT_PARSE_CACHE_MAX_ROWS:
+                rows = None
+        yield batch
+    if rows is not None:
+        cache.set(key, rows)
+
+
+def windows(batches, rows):
+    """
+    Group consecutive parser batches until they hold at least `rows` rows
+    Returns: iterator of lists of batches
+    """
+    window, size = [], 0
+    for batch in batches:
+        window.append(batch)
+        size += len(batch)
+        if size >= rows:
+            yield window
+            window, size = [], 0
+    if window:
+        yield window
+
+
+def drop_duplicates(statement, batch, seen):
+    """
+    Leave out rows already stored from the user's other statements, e.g. the
+    days two monthly exports overlap on. Duplicates are counted, so a row that
+    really occurs twice is kept once if only one copy exists. `seen` carries the
+    counts between the batches of a statement: one query per batch at most.
+    Returns: (rows to insert, their fingerprints, number of rows dropped)
+    """
+    fingerprints = [
+        transaction_fingerprint(statement.user_id, statement.account_id, row['date'], row['description'], row['amount'])
+        for row in batch
+    ]
+    unknown = set(fingerprints).difference(seen)
+    if unknown:
+        seen.update(dict.fromkeys(unknown, 0))
+        seen.update(
+            Transaction.objects.filter(user_id=statement.user_id, fingerprint__in=unknown)
+            .exclude(statement=statement)
+            .values('fingerprint').annotate(copies=Count('id')).order_by()
+            .values_list('fingerprint', 'copies')
+        )
+
+    rows, kept = [], []
+    for row, fingerprint in zip(batch, fingerprints):
+        if seen[fingerprint]:
+            seen[fingerprint] -= 1
+        else:
+            rows.append(row)
+            kept.append(fingerprint)
+    return rows, kept, len(batch) - len(rows)
+
+
+def process_statement(statement_id=None, statement=None):
+    """
+    Parse, categorize and insert one statement, recording progress as it goes.
+    Pass either a statement_id to claim, or an already claimed statement.
+    Returns: the processed Statement, or None if it could not be claimed
+    """
+    statement = statement or claim(statement_id)
+    if statement is None:
+        return None
+
+    finished = True
+    try:
+        if statement.file_type == 'CSV':
+            parser = CSVParser()
+        else:
+            parser = PDFParser(workers=settings.PDF_PARSER_WORKERS, backend=settings.PDF_PARSER_BACKEND)
+        categorizer = ExpenseCategorizer(user_id=statement.user_id)
+        duplicates_seen = {}
+        window_rows = CATEGORIZE_WINDOW if categorizer.workers > 1 else BATCH_SIZE
+
+        # Batches are categorized and inserted as they are parsed, so a large
+        # CSV never has to be held in memory as a whole
+        for batches in windows(parsed_batches(statement, parser), window_rows):
+            if statement.status == 'PARSING' and not statement.transition('CATEGORIZING'):
+                raise ClaimLost(statement)
+            _set_progress(statement, rows_parsed=statement.rows_parsed + sum(len(batch) for batch in batches))
+
+            # Duplicates are looked up per parser batch, keeping each query's IN list short
+            rows, fingerprints, duplicates = [], [], 0
+            for batch in batches:
+                kept, kept_fingerprints, dropped = drop_duplicates(statement, batch, duplicates_seen)
+                rows.extend(kept)
+                fingerprints.extend(kept_fingerprints)
+                duplicates += dropped
+            categories = categorizer.categorize_bulk(rows)
+            _set_progress(
+                statement,
+                rows_categorized=statement.rows_categorized + len(rows),
+                rows_duplicate=statement.rows_duplicate + duplicates
+            )
+
+            if statement.status == 'CATEGORIZING' and not statement.transition('INSERTING'):
+                raise ClaimLost(statement)
+            for start in range(0, len(rows), BATCH_SIZE):
+                chunk = slice(start, start + BATCH_SIZE)
+                with transaction.atomic():
+                    # Checks the claim in the insert's transaction: a stale
+                    # reset either waits for it or makes it roll back
+                    _set_progress(statement, rows_inserted=statement.rows_inserted + len(rows[chunk]))
+                    created = Transaction.objects.bulk_create([
+                        Transaction(
+                            user_id=statement.user_id,
+                            statement=statement,
+                            category=category,
+                            date=trans_data['date'],
+                            description=trans_data['description'],
+                            amount=trans_data['amount'],
+                            currency=statement.currency,
+                            fingerprint=fingerprint,
+                            merchant_key=normalize_description(trans_data['description'])
+                        )
+                        for trans_data, category, fingerprint in zip(rows[chunk], categories[chunk], fingerprints[chunk])
+                    ])
+                    rollups.add_transactions(statement, created)
+                    summaries.add_transactions(statement, created)
+                dashboard_cache.bump_user_version(statement.user_id)
+
+        if not statement.rows_inserted and not statement.rows_duplicate:
+            raise ValueError('No valid transactions found.')
+
+        if not statement.transition('COMPLETED', finished_at=timezone.now()):
+            raise ClaimLost(statement)
+
+    except ClaimLost as e:
+        # Whoever reset or deleted the statement also cleaned up after it,
+        # and a re-queued statement still needs its file
+        logger.warning('%s', e)
+        finished = False
+
+    except Exception as e:
+        logger.warning('Statement %s failed: %s', statement.pk, e)
+        # Only clean up while still holding the claim
+        if statement.transition('FAILED', error=str(e), finished_at=timezone.now()):
+            with transaction.atomic():
+                Transaction.objects.filter(statement_id=statement.pk).delete()
+                rollups.remove(statement)
+                summaries.remove(statement)
+            dashboard_cache.bump_user_version(statement.user_id)
+        else:
+            finished = False
+
+    finally:
+        if finished:
+            _unlink(statement.file_path)
+
+    return statement
+
+
+def _unlink(file_path):
+    if file_path:
+        try:
+            os.unlink(file_path)
+        except FileNotFoundError:
+            pass
+
+
+@receiver(post_delete, sender=Statement, dispatch_uid='statement_upload_delete')
+def _statement_deleted(sender, instance, **kwargs):
+    # Uploads of statements deleted before (or while) being processed
+    transaction.on_commit(lambda: _unlink(instance.file_path))
@@ -0,0 +1,706 @@
+import io
+import os
+import random
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework import viewsets
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+from expenses import dashboard_cache, recategorization, rollups, summaries, views
+from expenses.categorizer import ExpenseCategorizer, category_cache, shutdown_pool
+from expenses.models import Category, RecategorizationJob, Statement, Transaction, User
+from expenses.parsers import CSVParser, DateParser, PDFParser, StatementParser
+from expenses.registry import category_registry
+from expenses.rollups import SpendingSource
+from expenses.serializers import TransactionSerializer
+from expenses.testing import (
+    legacy_categorize, legacy_extract_text, legacy_parse_csv, sample_date_strings, sample_descriptions,
+    sample_page_text, write_sample_csv, write_sample_pdf, write_sample_table_pdf
+)
+
+
+def automaton_categorize(categorizer, description_lower):
+    """Per-text automaton scoring of an already lowercased text, the baseline of the score matrix"""
+    if not description_lower:
+        return categorizer._get_uncategorized()
+
+    scores = {}
+    for keyword, (per_category, bounded) in categorizer.matcher.scan(description_lower).items():
+        if keyword == description_lower:
+            points = categorizer.EXACT_SCORE
+        elif bounded:
+            points = categorizer.WORD_SCORE
+        else:
+            points = categorizer.SUBSTRING_SCORE
+        for cat_name, occurrences in per_category.items():
+            scores[cat_name] = scores.get(cat_name, 0) + points * occurrences
+
+    # Keep category load order so ties still go to the first category
+    category_scores = {
+        cat_name: scores[cat_name] for cat_name in categorizer.categories if scores.get(cat_name, 0) > 0
+    }
+    if category_scores:
+        best_category = max(category_scores, key=category_scores.get)
+        return categorizer.categories[best_category]['instance']
+    return categorizer._get_uncategorized()
+
+
+def seed_dashboard_user(rows, statements=3, batch_size=1000, seed=42):
+    """
+    Throwaway user with `rows` transactions over two years, inserted in batches
+    through the same rollup and summary bookkeeping as ingestion. Delete the
+    user when done.
+    """
+    rng = random.Random(seed)
+    suffix = rng.randrange(10 ** 9)
+    user = User.objects.create_user(
+        username=f'benchmark-{suffix}', email=f'benchmark-{suffix}@example.com', password=None
+    )
+    categories = list(Category.objects.all()) + [None]
+    start = datetime(2024, 1, 1).date()
+    per_statement = -(-rows // statements)
+    for number in range(statements):
+        statement = Statement.objects.create(
+            user=user, file_name=f'benchmark-{number}.csv', file_type='CSV', status='COMPLETED'
+        )
+        count = min(per_statement, rows - number * per_statement)
+        for offset in range(0, count, batch_size):
+            with transaction.atomic():
+                created = Transaction.objects.bulk_create([
+                    Transaction(
+                        user=user, statement=statement, category=rng.choice(categories),
+                        date=start.fromordinal(start.toordinal() + rng.randrange(730)),
+                        description='BENCHMARK', amount=Decimal(rng.randrange(1, 500000)) / 100
+                    )
+                    for _ in range(min(batch_size, count - offset))
+                ])
+                rollups.add_transactions(statement, created)
+                summaries.add_transactions(statement, created)
+    return user
+
+
+# Most queries a dashboard request may run with a warm category registry,
+# however many categories, months or transactions there are
+DASHBOARD_QUERY_BUDGET = {
+    'summary': 2,
+    'category-breakdown': 1,
+    'top-categories': 1,
+    'spending-trend': 1,
+    'spending-by-weekday': 1,
+    'recommendations': 1,
+    'dashboard': 4,
+}
+
+
+# Targets that seed synthetic users and transactions (and, for indexes, drop
+# and re-create indexes): they run against a throwaway test database
+SEEDING_TARGETS = {'dashboard', 'indexes', 'export', 'serializer', 'summary'}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark hot paths of statement ingestion and report throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=['categorizer', 'categorizer-shards', 'csv', 'csv-stream', 'pdf', 'pdf-backends', 'pdf-text', 'dates', 'dashboard', 'indexes', 'export', 'serializer', 'summary'])
+        parser.add_argument('--rows', type=int, default=20000, help='Number of synthetic rows')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per variant (best is reported)')
+        parser.add_argument('--pages', type=int, default=60, help='Pages in the synthetic PDF statement')
+        parser.add_argument('--files', nargs='*', default=[], help='PDF statements to use instead of synthetic ones')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Parallel workers to compare')
+
+    def handle(self, *args, **options):
+        bench = getattr(self, f"bench_{options['target'].replace('-', '_')}")
+        if options['target'] not in SEEDING_TARGETS:
+            bench(options)
+            return
+
+        old_name = connection.settings_dict['NAME']
+        test_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        self.stdout.write(f'using throwaway database {test_name}')
+        try:
+            call_command('init_categories', stdout=io.StringIO())
+            category_registry.invalidate()
+            bench(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _time(self, func, repeat):
+        best = None
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def _report(self, label, rows, seconds, unit='rows'):
+        self.stdout.write(f'{label:<24} {seconds:8.3f}s  {rows / seconds:12,.0f} {unit}/s')
+
+    def bench_categorizer(self, options):
+        categorizer = ExpenseCategorizer()
+        if not categorizer.categories:
+            raise CommandError('No categories found. Run "python manage.py init_categories" first.')
+
+        rows = options['rows']
+        descriptions = sample_descriptions(rows)
+
+        legacy_time, legacy = self._time(
+            lambda: [legacy_categorize(categorizer, d) for d in descriptions], options['repeat']
+        )
+        current_time, current = self._time(
+            lambda: [automaton_categorize(categorizer, d.lower()) for d in descriptions], options['repeat']
+        )
+
+        mismatches = sum(1 for old, new in zip(legacy, current) if old.pk != new.pk)
+        self._report('legacy (regex/keyword)', rows, legacy_time, 'descriptions')
+        self._report('automaton', rows, current_time, 'descriptions')
+        self.stdout.write(f'speedup: {legacy_time / current_time:.1f}x, mismatches: {mismatches}')
+        if mismatches:
+            raise CommandError(f'{mismatches} descriptions categorized differently')
+
+        # Score matrix over the distinct scoring keys (plus every bare keyword,
+        # where shared keywords tie) vs one automaton_categorize call each
+        keys = [categorizer.description_key(d) for d in descriptions]
+        unique = list(dict.fromkeys(keys + list(categorizer.keyword_columns)))
+        loop_time, looped = self._time(lambda: [automaton_categorize(categorizer, key) for key in unique], options['repeat'])
+        matrix_time, matrix = self._time(lambda: categorizer.score_texts(unique), options['repeat'])
+        mismatches = sum(1 for old, new in zip(looped, matrix) if old.pk != new.pk)
+        self._report('automaton loop', len(unique), loop_time, 'distinct keys')
+        self._report('score_texts matrix', len(unique), matrix_time, 'distinct keys')
+        self.stdout.write(f'speedup: {loop_time / matrix_time:.1f}x, mismatches: {mismatches}')
+        if mismatches:
+            raise CommandError(f'{mismatches} descriptions scored differently by score_texts')
+
+        # categorize_bulk over statement-sized batches, cold then warm process cache
+        batches = [[{'description': d} for d in descriptions[start:start + 1000]] for start in range(0, rows, 1000)]
+        category_cache.clear()
+        cold_time, bulk = self._time(
+            lambda: [category for batch in batches for category in categorizer.categorize_bulk(batch)], 1
+        )
+        warm_time, _ = self._time(
+            lambda: [category for batch in batches for category in categorizer.categorize_bulk(batch)], options['repeat']
+        )
+        self._report('categorize_bulk (cold)', rows, cold_time, 'descriptions')
+        self._report('categorize_bulk (warm)', rows, warm_time, 'descriptions')
+        self.stdout.write(
+            f'distinct descriptions: {len(set(descriptions)):,}, scoring keys: {len(set(keys)):,}; '
+            f'cache: {category_cache.stats()}'
+        )
+        mismatches = sum(1 for old, new in zip(legacy, bulk) if old.pk != new.pk)
+        if mismatches:
+            raise CommandError(f'categorize_bulk categorized {mismatches} raw descriptions differently from legacy')
+
+    def bench_categorizer_shards(self, options):
+        """
+        Serial score matrix vs shards on the warm process pool as the number of
+        distinct descriptions grows, and the smallest number where the pool
+        wins: the crossover to use for CATEGORIZER_PARALLEL_MIN_ROWS here
+        """
+        serial = ExpenseCategorizer(workers=1)
+        if not serial.categories:
+            raise CommandError('No categories found. Run "python manage.py init_categories" first.')
+        keys = list(dict.fromkeys(serial.description_key(d) for d in sample_descriptions(options['rows'])))
+        sharded = ExpenseCategorizer(workers=options['workers'])
+        sizes = sorted({size for size in (1000, 2000, 5000, 10000, 20000, 50000, 100000) if size < len(keys)} | {len(keys)})
+
+        crossover = None
+        try:
+            with override_settings(CATEGORIZER_PARALLEL_MIN_ROWS=0):
+                # Paid once per process: the pool is shared and kept running
+                cold_time, _ = self._time(lambda: sharded.score_texts(keys[:sizes[0]]), 1)
+                self._report(f"{options['workers']} workers (cold)", sizes[0], cold_time, 'keys')
+
+                self.stdout.write(f"{'keys':>10} {'serial':>10} {'pool':>10} {'speedup':>8}")
+                for size in sizes:
+                    chunk = keys[:size]
+                    serial_time, expected = self._time(lambda: serial.score_texts(chunk), options['repeat'])
+                    pool_time, result = self._time(lambda: sharded.score_texts(chunk), options['repeat'])
+                    mismatches = sum(1 for old, new in zip(expected, result) if old.pk != new.pk)
+                    if mismatches or len(result) != len(expected):
+                        raise CommandError(f'{mismatches} descriptions scored differently by the process pool')
+                    self.stdout.write(
+                        f'{size:>10,} {serial_time:>9.3f}s {pool_time:>9.3f}s {serial_time / pool_time:>7.1f}x'
+                    )
+                    if crossover is None and pool_time < serial_time:
+                        crossover = size
+        finally:
+            shutdown_pool()
+
+        if crossover is None:
+            self.stdout.write(self.style.WARNING(
+                f"{options['workers']} workers never beat serial scoring here: keep CATEGORIZER_WORKERS=1"
+            ))
+        else:
+            self.stdout.write(f'crossover: {crossover:,} keys; set CATEGORIZER_PARALLEL_MIN_ROWS to about that')
+
+    def bench_csv(self, options):
+        rows = options['rows']
+        csv_path = write_sample_csv(rows)
+        try:
+            legacy_time, legacy = self._time(lambda: legacy_parse_csv(csv_path), options['repeat'])
+            current_time, current = self._time(lambda: CSVParser().parse(csv_path), options['repeat'])
+        finally:
+            os.unlink(csv_path)
+
+        self._report('legacy (iterrows)', rows, legacy_time)
+        self._report('vectorized', rows, current_time)
+        self.stdout.write(f'speedup: {legacy_time / current_time:.1f}x, transactions: {len(current)}')
+        if legacy != current:
+            raise CommandError('Vectorized parser output differs from the row-by-row parser')
+
+    def bench_csv_stream(self, options):
+        """Peak traced memory of whole-file parse() vs parse_batches() as the file grows"""
+        self.stdout.write(f"{'rows':>10} {'parse() peak':>14} {'batches peak':>14} {'batches time':>13}")
+        for rows in (options['rows'] // 4, options['rows'], options['rows'] * 4):
+            csv_path = write_sample_csv(rows)
+            try:
+                tracemalloc.start()
+                whole = CSVParser().parse(csv_path)
+                whole_peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                del whole
+
+                tracemalloc.start()
+                started = time.perf_counter()
+                streamed = sum(len(batch) for batch in CSVParser().parse_batches(csv_path, 1000))
+                elapsed = time.perf_counter() - started
+                stream_peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            finally:
+                os.unlink(csv_path)
+
+            self.stdout.write(
+                f'{rows:>10,} {whole_peak / 2 ** 20:>12.1f}MB {stream_peak / 2 ** 20:>12.1f}MB {elapsed:>12.2f}s'
+            )
+            if streamed != rows:
+                raise CommandError(f'Streaming parser returned {streamed} of {rows} rows')
+
+    def bench_pdf(self, options):
+        pages = options['pages']
+        pdf_path = write_sample_pdf(pages)
+        try:
+            # pdfplumber is the backend slow enough to be worth parallelising
+            serial_time, serial = self._time(
+                lambda: PDFParser(workers=1, backend='pdfplumber').parse(pdf_path), options['repeat']
+            )
+            parallel_time, parallel = self._time(
+                lambda: PDFParser(workers=options['workers'], backend='pdfplumber').parse(pdf_path), options['repeat']
+            )
+        finally:
+            os.unlink(pdf_path)
+
+        self._report('serial', pages, serial_time, 'pages')
+        self._report(f"{options['workers']} workers", pages, parallel_time, 'pages')
+        self.stdout.write(f'speedup: {serial_time / parallel_time:.1f}x, transactions: {len(parallel)}')
+        if serial != parallel:
+            raise CommandError('Parallel PDF extraction differs from the serial pass')
+
+    def bench_pdf_backends(self, options):
+        """
+        Time per page for each PDF text backend over a corpus, and the
+        transactions each finds that pdfplumber does not (extra) or misses
+        """
+        import fitz
+
+        generated = []
+        files = options['files']
+        if not files:
+            generated = [write_sample_pdf(options['pages']), write_sample_table_pdf(max(1, options['pages'] // 4))]
+            files = generated
+
+        differing = []
+        try:
+            self.stdout.write(
+                f"{'file':<32} {'backend':<12} {'pages':>6} {'ms/page':>9} {'transactions':>13} {'missing':>8} {'extra':>6}"
+            )
+            for path in files:
+                with fitz.open(path) as document:
+                    pages = document.page_count
+                results = {}
+                for backend in ('pdfplumber', *(name for name in PDFParser.BACKENDS if name != 'pdfplumber')):
+                    elapsed, transactions = self._time(
+                        lambda: PDFParser(backend=backend).parse(path), options['repeat']
+                    )
+                    found = Counter((t['date'], t['description'], t['amount']) for t in transactions)
+                    results.setdefault('pdfplumber', found)
+                    missing = results['pdfplumber'] - found
+                    extra = found - results['pdfplumber']
+                    self.stdout.write(
+                        f'{os.path.basename(path)[-32:]:<32} {backend:<12} {pages:>6} '
+                        f'{elapsed * 1000 / max(pages, 1):>9.1f} {len(transactions):>13} '
+                        f'{sum(missing.values()):>8} {sum(extra.values()):>6}'
+                    )
+                    for label, rows in (('missing', missing), ('extra', extra)):
+                        for row in list(rows)[:3]:
+                            self.stdout.write(f'    {label}: {row[0]} {row[1]!r} {row[2]}')
+                    if missing or extra:
+                        differing.append(f'{os.path.basename(path)} ({backend})')
+        finally:
+            for path in generated:
+                os.unlink(path)
+
+        if differing:
+            raise CommandError(f"Transactions differ from pdfplumber's: {', '.join(differing)}")
+
+    def bench_pdf_text(self, options):
+        """Text-pattern extraction on large pages: three finditer passes vs one candidate scan"""
+        parser = PDFParser()
+        lines = options['rows']
+        text = sample_page_text(lines)
+
+        legacy_time, legacy = self._time(lambda: legacy_extract_text(parser, text), options['repeat'])
+        current_time, current = self._time(lambda: parser._extract_transactions_from_text(text), options['repeat'])
+
+        self._report('legacy (3 passes)', lines, legacy_time, 'lines')
+        self._report('single scan', lines, current_time, 'lines')
+        self.stdout.write(f'speedup: {legacy_time / current_time:.1f}x, transactions: {len(current)}')
+        if legacy != current:
+            raise CommandError('Single-scan text extraction differs from the three-pass version')
+
+    def bench_dates(self, options):
+        """Date cells: the ordered strptime loop vs a per-statement DateParser"""
+        rows = options['rows']
+        values = sample_date_strings(rows)
+
+        def legacy():
+            results = []
+            for value in values:
+                try:
+                    results.append(StatementParser.parse_date(value))
+                except ValueError:
+                    results.append(None)
+            return results
+
+        def current():
+            dates = DateParser()
+            results = []
+            for value in values:
+                try:
+                    results.append(dates.parse(value))
+                except ValueError:
+                    results.append(None)
+            return results
+
+        legacy_time, expected = self._time(legacy, options['repeat'])
+        current_time, actual = self._time(current, options['repeat'])
+
+        self._report('legacy (strptime loop)', rows, legacy_time)
+        self._report('DateParser', rows, current_time)
+        self.stdout.write(f'speedup: {legacy_time / current_time:.1f}x')
+        if expected != actual:
+            raise CommandError('DateParser results differ from parse_date')
+
+    def bench_dashboard(self, options):
+        """Dashboard endpoints over raw transactions vs SpendingRollup, checking equal responses"""
+        rows = options['rows']
+        self.stdout.write(f'seeding {rows:,} transactions...')
+        user = seed_dashboard_user(rows)
+        try:
+            statement_id = str(user.statements.order_by('id').first().id)
+            filters = [
+                {},
+                {'statement_id': statement_id},
+                {'start_date': '2024-03-01', 'end_date': '2025-02-28'},
+            ]
+            endpoints = {
+                'summary': views.dashboard_summary,
+                'category-breakdown': views.category_breakdown,
+                'top-categories': views.top_categories,
+                'spending-trend': views.spending_trend,
+                'spending-by-weekday': views.spending_by_weekday,
+            }
+            factory = APIRequestFactory()
+
+            def respond(endpoint, params, cached=False, **headers):
+                if not cached:
+                    # Measure the computation, not the response cache
+                    dashboard_cache.bump_user_version(user.pk)
+                request = factory.get('/api/dashboard/', params, **headers)
+                force_authenticate(request, user=user)
+                return endpoint(request)
+
+            def call(endpoint, params, cached=False):
+                return respond(endpoint, params, cached).data
+
+            for name, endpoint in endpoints.items():
+                for params in filters:
+                    with override_settings(DASHBOARD_USE_ROLLUPS=False):
+                        raw_time, expected = self._time(lambda: call(endpoint, params), options['repeat'])
+                    rollup_time, actual = self._time(lambda: call(endpoint, params), options['repeat'])
+                    label = f"{name} {'/'.join(params) or 'all'}"
+                    self.stdout.write(
+                        f'{label:<44} raw {raw_time * 1000:8.1f}ms  rollup {rollup_time * 1000:8.1f}ms  '
+                        f'({raw_time / rollup_time:.1f}x)'
+                    )
+                    if expected != actual:
+                        raise CommandError(f'{label}: rollup response differs from raw aggregation')
+
+            endpoints['recommendations'] = views.ai_recommendations
+            endpoints['dashboard'] = views.dashboard
+            category_registry.all()
+            for name, endpoint in endpoints.items():
+                for params in filters:
+                    with CaptureQueriesContext(connection) as queries:
+                        call(endpoint, params)
+                    label = f"{name} {'/'.join(params) or 'all'}"
+                    self.stdout.write(f'{label:<44} {len(queries)} queries')
+                    if len(queries) > DASHBOARD_QUERY_BUDGET[name]:
+                        raise CommandError(f'{label}: {len(queries)} queries, budget is {DASHBOARD_QUERY_BUDGET[name]}')
+            del endpoints['recommendations'], endpoints['dashboard']
+
+            for params in filters:
+                separate_time, separate = self._time(
+                    lambda: {name: call(endpoint, params) for name, endpoint in endpoints.items()}, options['repeat']
+                )
+                combined_time, combined = self._time(lambda: call(views.dashboard, params), options['repeat'])
+                label = f"combined {'/'.join(params) or 'all'}"
+                self.stdout.write(
+                    f'{label:<44} 5 endpoints {separate_time * 1000:8.1f}ms  dashboard {combined_time * 1000:8.1f}ms'
+                )
+                if separate['summary'] != combined['summary'] or separate['spending-trend'] != combined['spending_trend']:
+                    raise CommandError(f'{label}: combined dashboard differs from the single-panel endpoints')
+
+            dashboard_cache.reset_stats()
+            for params in filters:
+                cold_time, expected = self._time(lambda: call(views.dashboard, params), options['repeat'])
+                call(views.dashboard, params, cached=True)
+                warm_time, actual = self._time(lambda: call(views.dashboard, params, cached=True), options['repeat'])
+                etag = respond(views.dashboard, params, cached=True)['ETag']
+                revalidate_time, response = self._time(
+                    lambda: respond(views.dashboard, params, cached=True, HTTP_IF_NONE_MATCH=etag), options['repeat']
+                )
+                label = f"cached {'/'.join(params) or 'all'}"
+                self.stdout.write(
+                    f'{label:<44} miss {cold_time * 1000:8.1f}ms  hit {warm_time * 1000:6.2f}ms  '
+                    f'304 {revalidate_time * 1000:6.2f}ms'
+                )
+                if expected != actual or response.status_code != 304:
+                    raise CommandError(f'{label}: cached dashboard differs from a fresh one')
+            self.stdout.write(f'cache stats: {dashboard_cache.stats()}')
+        finally:
+            user.delete()
+
+    def bench_summary(self, options):
+        """
+        Dashboard summary from SpendingSummary vs aggregating the raw rows,
+        checking equal responses after inserts, category moves and a deletion
+        """
+        rows = options['rows']
+        self.stdout.write(f'seeding {rows:,} transactions...')
+        user = seed_dashboard_user(rows)
+        try:
+            factory = APIRequestFactory()
+            category_registry.all()
+
+            def call(params):
+                dashboard_cache.bump_user_version(user.pk)
+                request = factory.get('/api/dashboard/summary/', params)
+                force_authenticate(request, user=user)
+                return views.dashboard_summary(request).data
+
+            def compare(stage):
+                for params in ({}, {'statement_id': str(user.statements.order_by('id').first().id)}):
+                    with override_settings(DASHBOARD_USE_ROLLUPS=False):
+                        raw_time, expected = self._time(lambda: call(params), options['repeat'])
+                    record_time, actual = self._time(lambda: call(params), options['repeat'])
+                    with CaptureQueriesContext(connection) as queries:
+                        call(params)
+                    label = f"{stage} {'/'.join(params) or 'all'}"
+                    self.stdout.write(
+                        f'{label:<36} raw {raw_time * 1000:8.1f}ms  summary {record_time * 1000:8.1f}ms  '
+                        f'({raw_time / record_time:.1f}x, {len(queries)} queries)'
+                    )
+                    if expected != actual:
+                        raise CommandError(f'{label}: {actual} differs from raw aggregation {expected}')
+                    if len(queries) > 1:
+                        raise CommandError(f'{label}: {len(queries)} queries, expected 1')
+
+            compare('inserted')
+
+            # Move a third of the rows to other categories through the rollup bookkeeping
+            categories = list(Category.objects.values_list('pk', flat=True))
+            moved = Transaction.objects.filter(pk__in=list(user.transactions.values_list('pk', flat=True))[::3])
+            with transaction.atomic():
+                rollups.move_transactions(moved, lambda: moved.update(category_id=categories[0]))
+            job = recategorization.run(RecategorizationJob.objects.create(user=user))
+            self.stdout.write(f'recategorized {job.rows_changed:,} of {job.rows_scanned:,} transactions')
+            compare('moved')
+
+            user.statements.order_by('id').last().delete()
+            compare('deleted')
+
+            drift = summaries.rebuild(user_id=user.pk, commit=False)
+            if drift:
+                raise CommandError(f'{len(drift)} summary fields drifted, e.g. {drift[0]}')
+        finally:
+            user.delete()
+
+    def bench_indexes(self, options):
+        """
+        Hot Transaction queries without and with the composite indexes: EXPLAIN
+        plans and latencies. Drops and re-creates the indexes of the throwaway
+        database it runs on.
+        """
+        rows = options['rows']
+        self.stdout.write(f'seeding {rows:,} transactions over 4 users...')
+        users = [seed_dashboard_user(rows // 4, batch_size=5000, seed=seed) for seed in range(4)]
+        try:
+            user = users[0]
+            statement = user.statements.order_by('id').first()
+            category = Category.objects.order_by('id').first()
+            window = {'date__gte': '2024-03-10', 'date__lte': '2024-06-20'}
+
+            def dashboard_groups(**filters):
+                with override_settings(DASHBOARD_USE_ROLLUPS=False):
+                    source = SpendingSource(user, **filters)
+                return source.queryset.values(
+                    'category_id', 'category__name', period=source.month, day=source.weekday
+                ).annotate(total=source.total, count=source.count).order_by()
+
+            queries = {
+                'latest page': lambda: Transaction.objects.filter(user=user)[:50],
+                'statement page': lambda: Transaction.objects.filter(user=user, statement=statement)[:50],
+                'category page': lambda: Transaction.objects.filter(user=user, category=category)[:50],
+                'date range page': lambda: Transaction.objects.filter(user=user, **window)[:50],
+                # The grouped query behind the dashboard panels, on raw rows
+                'dashboard, date range': lambda: dashboard_groups(start_date=window['date__gte'],
+                                                                  end_date=window['date__lte']),
+                'dashboard, statement': lambda: dashboard_groups(statement_id=statement.id),
+            }
+            indexes = Transaction._meta.indexes
+
+            def run(label):
+                # Planner statistics, as PostgreSQL's autovacuum would keep them
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                self.stdout.write(f'--- {label}')
+                timings = {}
+                for name, queryset in queries.items():
+                    plan = queryset().explain()
+                    seconds, _ = self._time(lambda: list(queryset()), options['repeat'])
+                    timings[name] = seconds
+                    self.stdout.write(f'{name:<24} {seconds * 1000:8.2f}ms  {" | ".join(plan.splitlines())}')
+                return timings
+
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(Transaction, index)
+            try:
+                before = run('without composite indexes')
+            finally:
+                with connection.schema_editor() as editor:
+                    for index in indexes:
+                        editor.add_index(Transaction, index)
+            after = run('with composite indexes')
+
+            self.stdout.write('--- speedup')
+            for name in queries:
+                self.stdout.write(f'{name:<24} {before[name] / after[name]:6.1f}x')
+        finally:
+            for user in users:
+                user.delete()
+
+    def bench_export(self, options):
+        """Streaming export throughput, and peak traced memory as the exported set grows"""
+        rows = options['rows']
+        self.stdout.write(f'seeding {rows:,} transactions...')
+        user = seed_dashboard_user(rows)
+        try:
+            statement_id = str(user.statements.order_by('id').first().id)
+            export = views.TransactionViewSet.as_view({'get': 'export'}, **views.TransactionViewSet.export.kwargs)
+            factory = APIRequestFactory()
+
+            def stream(params):
+                request = factory.get('/api/transactions/export/', params)
+                force_authenticate(request, user=user)
+                response = export(request)
+                # Header line excluded
+                return sum(chunk.count(b'\n') for chunk in response.streaming_content) - (params['format'] == 'csv')
+
+            self.stdout.write(f"{'export':<24} {'rows':>10} {'time':>9} {'rows/s':>12} {'peak':>10}")
+            for fmt in ('csv', 'ndjson'):
+                for label, params in (('statement', {'statement_id': statement_id}), ('all', {})):
+                    params = {'format': fmt, **params}
+                    elapsed, exported = self._time(lambda: stream(params), options['repeat'])
+                    tracemalloc.start()
+                    stream(params)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    self.stdout.write(
+                        f'{fmt + " " + label:<24} {exported:>10,} {elapsed:>8.2f}s {exported / elapsed:>12,.0f} '
+                        f'{peak / 2 ** 20:>8.1f}MB'
+                    )
+            if stream({'format': 'csv'}) != rows:
+                raise CommandError('Export did not return every transaction')
+        finally:
+            user.delete()
+
+    def bench_serializer(self, options):
+        """Transaction list serialization: ModelSerializer + JSONRenderer vs values() rows + orjson"""
+        rows = options['rows']
+        self.stdout.write(f'seeding {rows:,} transactions...')
+        user = seed_dashboard_user(rows)
+        try:
+            # Descriptions that stress JSON escaping
+            awkward = ['Caf\u00e9 "Le Sud"', 'back\\slash', 'tab\tnew\nline', 'sep\u2028para\u2029', '\x01\x1f\x7f', '\U0001f355 pizza']
+            for number, pk in enumerate(Transaction.objects.filter(user=user).values_list('id', flat=True)[:600]):
+                Transaction.objects.filter(pk=pk).update(description=awkward[number % len(awkward)])
+
+            transactions = Transaction.objects.filter(user=user).order_by('-date', '-id')
+            request = APIRequestFactory().get('/api/transactions/')
+            request.query_params = request.GET
+            context = {'request': request}
+
+            fetch_time, instances = self._time(lambda: list(transactions.select_related('category')), options['repeat'])
+            values_time, values = self._time(lambda: list(transactions.values(*TransactionSerializer.VALUES)), options['repeat'])
+            self._report('fetch instances', rows, fetch_time)
+            self._report('fetch values()', rows, values_time)
+
+            def legacy():
+                return JSONRenderer().render(TransactionSerializer(instances, many=True, context=context).data)
+
+            def fast():
+                return views.FastJSONRenderer().render(TransactionSerializer(values, many=True, context=context).data)
+
+            legacy_time, expected = self._time(legacy, options['repeat'])
+            fast_time, actual = self._time(fast, options['repeat'])
+            self._report('ModelSerializer', rows, legacy_time)
+            self._report('values() + orjson', rows, fast_time)
+            self.stdout.write(f'serialization speedup: {legacy_time / fast_time:.1f}x')
+            if expected != actual:
+                raise CommandError('Fast path output differs from TransactionSerializer')
+
+            # Whole responses, page by page, against the stock list() and renderer
+            class LegacyViewSet(views.TransactionViewSet):
+                renderer_classes = [JSONRenderer]
+                list = viewsets.ReadOnlyModelViewSet.list
+
+            factory = APIRequestFactory()
+            statement_id = str(user.statements.order_by('id').first().id)
+            for params in ({'page_size': 1000}, {'fields': 'id,amount,category_name'},
+                           {'statement_id': statement_id, 'page_size': 250}):
+                pages = 0
+                urls = ['/api/transactions/', '/api/transactions/']
+                while urls[0]:
+                    bodies = []
+                    for number, viewset in enumerate((LegacyViewSet, views.TransactionViewSet)):
+                        request = factory.get(urls[number], params if pages == 0 else None, SERVER_NAME='localhost')
+                        force_authenticate(request, user=user)
+                        response = viewset.as_view({'get': 'list'})(request)
+                        response.render()
+                        bodies.append(response.content)
+                        urls[number] = response.data['next']
+                    if bodies[0] != bodies[1]:
+                        raise CommandError(f'{params}: page {pages} differs from the stock list response')
+                    pages += 1
+                self.stdout.write(f"{'&'.join(params):<44} {pages} identical pages")
+        finally:
+            user.delete()
@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from expenses import ingestion
+
+
+class Command(BaseCommand):
+    help = 'Process queued statement uploads (PENDING statements) outside the web workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue instead of exiting when empty')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        processed = 0
+        reset = ingestion.reset_stale()
+        while True:
+            statement = ingestion.claim_next()
+            if statement is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+                reset += ingestion.reset_stale()
+                continue
+
+            ingestion.process_statement(statement=statement)
+            processed += 1
+            style = self.style.SUCCESS if statement.status == 'COMPLETED' else self.style.ERROR
+            self.stdout.write(style(
+                f'Statement {statement.id} ({statement.file_name}): {statement.status}, '
+                f'{statement.rows_inserted} transactions' + (f' - {statement.error}' if statement.error else '')
+            ))
+
+        if reset:
+            self.stdout.write(self.style.WARNING(f'Queued {reset} abandoned statements again.'))
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} statements.'))
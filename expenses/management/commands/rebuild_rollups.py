@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from expenses import dashboard_cache, rollups
+from expenses.models import User
+
+
+class Command(BaseCommand):
+    help = 'Recompute the spending rollups from the transactions and report where the stored ones drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only this user\'s rollups (email)')
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drift, leave the stored rollups as they are')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}")
+
+        drift = rollups.rebuild_all(user_id=user.pk if user else None, commit=not options['check'])
+        for key, (stored_total, stored_count), (total, count) in drift:
+            user_id, statement_id, account_id, category_id, month, weekday = key
+            self.stdout.write(
+                f'  user {user_id}, statement {statement_id}, account {account_id}, category {category_id}, '
+                f'{month:%Y-%m} weekday {weekday}: {stored_count} rows / {stored_total} was stored, '
+                f'should be {count} rows / {total}'
+            )
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('No drift: stored rollups match the transactions'))
+        elif options['check']:
+            raise CommandError(f'{len(drift)} rollups drifted; run without --check to rebuild them')
+        else:
+            for user_id in sorted({key[0] for key, *_ in drift}):
+                dashboard_cache.bump_user_version(user_id)
+            self.stdout.write(self.style.WARNING(f'Rebuilt rollups, {len(drift)} drifted rows corrected'))
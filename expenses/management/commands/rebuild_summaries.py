@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from expenses import dashboard_cache, summaries
+from expenses.models import User
+
+
+class Command(BaseCommand):
+    help = 'Recompute the spending summaries from the transactions and report where the stored ones drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only this user\'s summaries (email)')
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drift, leave the stored summaries as they are')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}")
+
+        drift = summaries.rebuild(user_id=user.pk if user else None, commit=not options['check'])
+        for user_id, statement_id, field, stored, rebuilt in drift:
+            scope = f'statement {statement_id}' if statement_id else 'all statements'
+            self.stdout.write(f'  user {user_id}, {scope}: {field} was {stored!r}, should be {rebuilt!r}')
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('No drift: stored summaries match the transactions'))
+        elif options['check']:
+            raise CommandError(f'{len(drift)} summary fields drifted; run without --check to rebuild them')
+        else:
+            for user_id in sorted({user_id for user_id, *_ in drift}):
+                dashboard_cache.bump_user_version(user_id)
+            self.stdout.write(self.style.WARNING(f'Rebuilt summaries, {len(drift)} drifted fields corrected'))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from expenses import recategorization
+from expenses.models import RecategorizationJob, User
+
+
+class Command(BaseCommand):
+    help = 'Re-apply the categorizer to stored transactions after category keywords change'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only recategorize this user\'s transactions (email)')
+        parser.add_argument('--batch-size', type=int, default=recategorization.BATCH_SIZE,
+                            help='Transactions per batch')
+        parser.add_argument('--resume', nargs='?', type=int, const=0, metavar='JOB_ID',
+                            help='Continue a pending, failed or abandoned job (the latest one if no id is given)')
+
+    def handle(self, *args, **options):
+        if options['resume'] is not None:
+            # A RUNNING job is still being processed by whoever claimed it, unless
+            # that runner has not reported progress for RECATEGORIZATION_STALE_AFTER
+            resumable = RecategorizationJob.claimable()
+            job = (
+                resumable.filter(pk=options['resume']).first() if options['resume']
+                else resumable.order_by('-created_at').first()
+            )
+            if job is None:
+                raise CommandError('No pending, failed or abandoned recategorization job to resume.')
+            self.stdout.write(f'Resuming job {job.pk} after transaction {job.last_id}')
+        else:
+            user = None
+            if options['user']:
+                user = User.objects.filter(email=options['user']).first()
+                if user is None:
+                    raise CommandError(f"No user with email {options['user']}")
+            job = RecategorizationJob.objects.create(user=user)
+            self.stdout.write(f'Started job {job.pk}')
+
+        def progress(job):
+            self.stdout.write(
+                f'  {job.rows_scanned:,} scanned, {job.rows_changed:,} changed (last id {job.last_id})'
+            )
+
+        if recategorization.run(job, batch_size=options['batch_size'], progress=progress) is None:
+            raise CommandError(f'Job {job.pk} was picked up by another runner first.')
+        style = self.style.SUCCESS if job.status == 'COMPLETED' else self.style.ERROR
+        self.stdout.write(style(
+            f'Job {job.pk}: {job.status}, {job.rows_changed:,} of {job.rows_scanned:,} transactions recategorized'
+            + (f' - {job.error}' if job.error else '')
+        ))
@@ -0,0 +1,37 @@
+from django.db import transaction
+from .models import MerchantRule, Transaction
+from . import dashboard_cache, rollups
+
+
+def matching_transactions(rule):
+    """Transactions a rule decides: the user's with its merchant key, or everyone's without a rule of their own"""
+    transactions = Transaction.objects.filter(merchant_key=rule.merchant_key)
+    if rule.user_id:
+        return transactions.filter(user_id=rule.user_id)
+    return transactions.exclude(user_id__in=MerchantRule.objects.filter(
+        merchant_key=rule.merchant_key, user__isnull=False
+    ).values('user_id'))
+
+
+def apply_rule(rule):
+    """
+    Move the stored transactions a rule matches to its category with a single
+    UPDATE, adjusting rollups in the same transaction.
+    Returns: number of transactions whose category changed
+    """
+    transactions = matching_transactions(rule)
+    outdated = transactions.exclude(category_id=rule.category_id)
+    updated = 0
+
+    def update():
+        nonlocal updated
+        updated = outdated.update(category_id=rule.category_id)
+
+    with transaction.atomic():
+        users = [rule.user_id] if rule.user_id else list(outdated.values_list('user_id', flat=True).distinct())
+        if users:
+            rollups.move_transactions(transactions, update)
+
+    for user_id in users:
+        dashboard_cache.bump_user_version(user_id)
+    return updated
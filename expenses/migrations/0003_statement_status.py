@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def processed_to_status(apps, schema_editor):
+    Statement = apps.get_model('expenses', 'Statement')
+    Statement.objects.filter(processed=False).update(
+        status='FAILED', error='Interrupted before processing finished.'
+    )
+    for statement in Statement.objects.filter(processed=True).annotate(rows=Count('transactions')):
+        statement.status = 'COMPLETED'
+        statement.rows_parsed = statement.rows_categorized = statement.rows_inserted = statement.rows
+        statement.save(update_fields=['status', 'rows_parsed', 'rows_categorized', 'rows_inserted'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0002_account_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statement',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='rows_categorized',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='rows_inserted',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='rows_parsed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('PARSING', 'Parsing'), ('CATEGORIZING', 'Categorizing'), ('INSERTING', 'Inserting'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], db_index=True, default='PENDING', max_length=20),
+        ),
+        migrations.RunPython(processed_to_status, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='statement',
+            name='processed',
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:45
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractWeekDay, TruncMonth
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    Transaction = apps.get_model('expenses', 'Transaction')
+    SpendingRollup = apps.get_model('expenses', 'SpendingRollup')
+    rows = Transaction.objects.annotate(
+        month=TruncMonth('date'), weekday=ExtractWeekDay('date')
+    ).values(
+        'user_id', 'statement_id', 'account_id', 'category_id', 'month', 'weekday'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+    SpendingRollup.objects.bulk_create((SpendingRollup(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0003_statement_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('weekday', models.PositiveSmallIntegerField(help_text='1=Sunday ... 7=Saturday, as ExtractWeekDay')),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('account', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='expenses.account')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rollups', to='expenses.category')),
+                ('statement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='expenses.statement')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'month'], name='expenses_sp_user_id_c47fd6_idx')],
+                'unique_together': {('statement', 'account', 'category', 'month', 'weekday')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
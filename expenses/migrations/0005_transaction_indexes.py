@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_spending_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date'], include=('amount', 'category'), name='expenses_tr_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'statement', '-date'], include=('amount', 'category'), name='expenses_tr_user_stmt_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['category', 'user', '-date'], name='expenses_tr_cat_user_date_idx'),
+        ),
+    ]
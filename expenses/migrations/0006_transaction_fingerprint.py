@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:24
+
+import hashlib
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def transaction_fingerprint(user_id, account_id, date, description, amount):
+    # Frozen copy of expenses.models.transaction_fingerprint as of this migration
+    key = '|'.join([
+        str(user_id),
+        '' if account_id is None else str(account_id),
+        date.isoformat(),
+        ' '.join(description.split()).casefold(),
+        str(Decimal(amount).quantize(Decimal('0.01'))),
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def fill_fingerprints(apps, schema_editor):
+    Transaction = apps.get_model('expenses', 'Transaction')
+    batch = []
+    for trans in Transaction.objects.only(
+        'user_id', 'account_id', 'date', 'description', 'amount'
+    ).order_by('pk').iterator(chunk_size=2000):
+        trans.fingerprint = transaction_fingerprint(
+            trans.user_id, trans.account_id, trans.date, trans.description, trans.amount
+        )
+        batch.append(trans)
+        if len(batch) == 2000:
+            Transaction.objects.bulk_update(batch, ['fingerprint'])
+            batch = []
+    Transaction.objects.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0005_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statement',
+            name='rows_duplicate',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, help_text='transaction_fingerprint() of the row', max_length=64),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'fingerprint'], name='expenses_tr_user_fprint_idx'),
+        ),
+    ]
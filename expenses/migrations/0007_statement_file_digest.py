@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_transaction_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statement',
+            name='file_digest',
+            field=models.CharField(blank=True, help_text='SHA-256 of the uploaded file', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='statement',
+            index=models.Index(fields=['user', 'file_digest'], name='expenses_st_user_digest_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:31
+
+import re
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Frozen copy of expenses.categorizer's noise pattern and normalize_description
+# as of this migration
+_NOISE = re.compile(
+    r'\b\d{1,4}[/.-]\d{1,2}(?:[/.-]\d{2,4})?\b'
+    r'|(?<![\w*])[x*]{2,}\d*(?!\w)'
+    r'|#\w*\d\w*'
+    r'|\b\d{3,}\b'
+)
+
+
+def normalize_description(description):
+    return ' '.join(_NOISE.sub(' ', description.lower()).split())
+
+
+def fill_merchant_keys(apps, schema_editor):
+    Transaction = apps.get_model('expenses', 'Transaction')
+    batch = []
+    for trans in Transaction.objects.only('description').order_by('pk').iterator(chunk_size=2000):
+        trans.merchant_key = normalize_description(trans.description)
+        batch.append(trans)
+        if len(batch) == 2000:
+            Transaction.objects.bulk_update(batch, ['merchant_key'])
+            batch = []
+    Transaction.objects.bulk_update(batch, ['merchant_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0008_recategorization_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MerchantRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('merchant_key', models.CharField(help_text="normalize_description() of the merchant's descriptions", max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['merchant_key'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='merchant_key',
+            field=models.CharField(blank=True, help_text='normalize_description() of the description', max_length=500),
+        ),
+        migrations.RunPython(fill_merchant_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'merchant_key'], name='expenses_tr_user_merchant_idx'),
+        ),
+        migrations.AddField(
+            model_name='merchantrule',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='merchant_rules', to='expenses.category'),
+        ),
+        migrations.AddField(
+            model_name='merchantrule',
+            name='user',
+            field=models.ForeignKey(blank=True, help_text='Empty for a rule applying to everyone', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='merchant_rules', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='merchantrule',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'merchant_key'), name='expenses_merchant_rule_user_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='merchantrule',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('merchant_key',), name='expenses_merchant_rule_global_key'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:40
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Round
+import django.db.models.deletion
+
+
+# Frozen copy of the folding in expenses.summaries as of this migration
+def fill_summaries(apps, schema_editor):
+    Transaction = apps.get_model('expenses', 'Transaction')
+    SpendingSummary = apps.get_model('expenses', 'SpendingSummary')
+    rows = Transaction.objects.values('user_id', 'statement_id', 'category_id', 'currency').annotate(
+        total=Round(Sum('amount'), 2), count=Count('id'), first_date=Min('date'), last_date=Max('date')
+    ).order_by()
+
+    summaries = {}
+    for row in rows:
+        category = '' if row['category_id'] is None else str(row['category_id'])
+        for user_id, statement_id in ((row['user_id'], row['statement_id']), (row['user_id'], None)):
+            summary = summaries.get((user_id, statement_id))
+            if summary is None:
+                summary = summaries[user_id, statement_id] = SpendingSummary(
+                    user_id=user_id, statement_id=statement_id, total=Decimal('0.00'), count=0,
+                    category_counts={}, currency_counts={}, first_date=None, last_date=None
+                )
+            summary.total += row['total']
+            summary.count += row['count']
+            summary.category_counts[category] = summary.category_counts.get(category, 0) + row['count']
+            summary.currency_counts[row['currency']] = summary.currency_counts.get(row['currency'], 0) + row['count']
+            summary.first_date = min(filter(None, [summary.first_date, row['first_date']]))
+            summary.last_date = max(filter(None, [summary.last_date, row['last_date']]))
+    SpendingSummary.objects.bulk_create(summaries.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0009_merchant_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('category_counts', models.JSONField(default=dict, help_text='Transactions per category id ("" for none)')),
+                ('currency_counts', models.JSONField(default=dict, help_text='Transactions per currency')),
+                ('first_date', models.DateField(blank=True, null=True)),
+                ('last_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('statement', models.OneToOneField(blank=True, help_text="Empty for the summary of all the user's statements", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='expenses.statement')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='spendingsummary',
+            constraint=models.UniqueConstraint(condition=models.Q(('statement__isnull', True)), fields=('user',), name='expenses_spending_summary_user'),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
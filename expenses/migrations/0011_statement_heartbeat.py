@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0010_spending_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statement',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last progress of the worker processing it', null=True),
+        ),
+    ]
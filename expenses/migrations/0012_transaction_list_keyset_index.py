@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0011_statement_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='expenses_tr_user_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date', '-id'], include=('amount', 'category'), name='expenses_tr_user_date_idx'),
+        ),
+    ]
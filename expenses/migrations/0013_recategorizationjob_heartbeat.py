@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0012_transaction_list_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recategorizationjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last progress of the runner processing it', null=True),
+        ),
+    ]
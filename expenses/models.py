@@ -3,6 +3,7 @@ from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from django.conf import settings
 from decimal import Decimal
+import hashlib
 
 # ========================================
 # 1. USER MODEL (MUST BE FIRST)
@@ -86,25 +87,96 @@ class Category(models.Model):
 # 4. STATEMENT MODEL
 # ========================================
 class Statement(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PARSING', 'Parsing'),
+        ('CATEGORIZING', 'Categorizing'),
+        ('INSERTING', 'Inserting'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    # Allowed moves of the ingestion state machine; claims whose worker stopped
+    # sending heartbeats go back to PENDING (see ingestion.reset_stale)
+    TRANSITIONS = {
+        'PENDING': ['PARSING', 'FAILED'],
+        'PARSING': ['CATEGORIZING', 'PENDING', 'FAILED'],
+        'CATEGORIZING': ['INSERTING', 'PENDING', 'FAILED'],
+        'INSERTING': ['COMPLETED', 'PENDING', 'FAILED'],
+        'COMPLETED': [],
+        'FAILED': [],
+    }
+    
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='statements')
     account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='statements', null=True)
     file_name = models.CharField(max_length=255)
     file_path = models.CharField(max_length=500, default='')
     file_type = models.CharField(max_length=10, choices=[('CSV', 'CSV'), ('PDF', 'PDF')])
+    file_digest = models.CharField(max_length=64, blank=True, help_text='SHA-256 of the uploaded file')
     currency = models.CharField(max_length=3, default='USD')
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    processed = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', db_index=True)
+    rows_parsed = models.PositiveIntegerField(default=0)
+    rows_categorized = models.PositiveIntegerField(default=0)
+    rows_inserted = models.PositiveIntegerField(default=0)
+    rows_duplicate = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text='Last progress of the worker processing it')
+    finished_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['user', 'file_digest'], name='expenses_st_user_digest_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.file_name}"
+    
+    @property
+    def processed(self):
+        """True once ingestion has completed"""
+        return self.status == 'COMPLETED'
+    
+    def transition(self, new_status, **fields):
+        """
+        Move to new_status with a compare-and-swap UPDATE on the current status
+        and claim time, so two workers can never claim or advance the same
+        statement, even after a stale claim was reset and claimed again.
+        Returns False if another worker (or a delete) got there first.
+        """
+        if new_status not in self.TRANSITIONS[self.status]:
+            raise ValueError(f"Invalid statement transition: {self.status} -> {new_status}")
+        
+        updated = Statement.objects.filter(
+            pk=self.pk, status=self.status, started_at=self.started_at
+        ).update(status=new_status, **fields)
+        if updated:
+            self.status = new_status
+            for name, value in fields.items():
+                setattr(self, name, value)
+        return bool(updated)
 
 
 # ========================================
 # 5. TRANSACTION MODEL
 # ========================================
+def transaction_fingerprint(user_id, account_id, date, description, amount):
+    """
+    Content hash identifying the same bank transaction across statements:
+    case and whitespace in the description and the amount's formatting are ignored.
+    """
+    key = '|'.join([
+        str(user_id),
+        '' if account_id is None else str(account_id),
+        date.isoformat(),
+        ' '.join(description.split()).casefold(),
+        str(Decimal(amount).quantize(Decimal('0.01'))),
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
 class Transaction(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='transactions')
     account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='transactions', null=True)
@@ -114,10 +186,28 @@ class Transaction(models.Model):
     description = models.CharField(max_length=500)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     currency = models.CharField(max_length=3, default='USD')
+    fingerprint = models.CharField(max_length=64, blank=True, help_text='transaction_fingerprint() of the row')
+    merchant_key = models.CharField(max_length=500, blank=True, help_text='normalize_description() of the description')
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Every list/dashboard query filters by user, then optionally by
+            # statement or category and a date range, newest first. The first two
+            # also carry amount/category so aggregates can be answered from the
+            # index alone (INCLUDE is PostgreSQL-only; other backends get the keys).
+            # id breaks ties within a day for the list's (date, id) keyset cursor.
+            models.Index(fields=['user', '-date', '-id'], include=['amount', 'category'], name='expenses_tr_user_date_idx'),
+            models.Index(fields=['user', 'statement', '-date'], include=['amount', 'category'], name='expenses_tr_user_stmt_date_idx'),
+            # Category first: led by user, the planner picks it for user-only
+            # queries that group by category and scans all of the user's rows
+            models.Index(fields=['category', 'user', '-date'], name='expenses_tr_cat_user_date_idx'),
+            # Duplicate lookups of an upload batch
+            models.Index(fields=['user', 'fingerprint'], name='expenses_tr_user_fprint_idx'),
+            # Re-applying a merchant rule to matching transactions
+            models.Index(fields=['user', 'merchant_key'], name='expenses_tr_user_merchant_idx'),
+        ]
     
     def __str__(self):
         return f"{self.date} - {self.description}: {self.amount}"
@@ -141,3 +231,182 @@ class PasswordResetToken(models.Model):
     def is_valid(self):
         from django.utils import timezone
         return not self.used and timezone.now() < self.expires_at
+
+
+# ========================================
+# 7. SPENDING ROLLUP MODEL
+# ========================================
+class SpendingRollup(models.Model):
+    """
+    Transaction totals per (user, statement, account, category, month, weekday).
+    Kept in step with Transaction by ingestion (see expenses/rollups.py) so the
+    dashboards can aggregate a few rows per month instead of every transaction.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='spending_rollups')
+    statement = models.ForeignKey(Statement, on_delete=models.CASCADE, related_name='rollups')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='rollups', null=True)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='rollups')
+    month = models.DateField(help_text="First day of the month")
+    weekday = models.PositiveSmallIntegerField(help_text="1=Sunday ... 7=Saturday, as ExtractWeekDay")
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['statement', 'account', 'category', 'month', 'weekday']
+        indexes = [models.Index(fields=['user', 'month'])]
+    
+    def __str__(self):
+        return f"{self.statement_id} {self.month:%Y-%m} {self.category_id}/{self.weekday}: {self.total}"
+
+
+# ========================================
+# 8. RECATEGORIZATION JOB MODEL
+# ========================================
+class RecategorizationJob(models.Model):
+    """
+    One pass of the categorizer over stored transactions (see
+    expenses/recategorization.py). Transactions are walked in id order and
+    last_id is committed with each batch, so an interrupted job resumes where
+    it stopped. A RUNNING job whose runner has not reported progress for
+    RECATEGORIZATION_STALE_AFTER seconds counts as abandoned and can be claimed again.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='recategorization_jobs', help_text='Only this user\'s transactions; empty for everyone'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    last_id = models.BigIntegerField(default=0, help_text='Highest transaction id processed so far')
+    rows_scanned = models.PositiveIntegerField(default=0)
+    rows_changed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text='Last progress of the runner processing it')
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    # Jobs a runner may pick up; a RUNNING one belongs to whoever claimed it until it goes stale
+    CLAIMABLE = ('PENDING', 'FAILED')
+    
+    def __str__(self):
+        return f"Recategorization {self.pk} ({self.status}): {self.rows_changed}/{self.rows_scanned} changed"
+    
+    @classmethod
+    def claimable(cls):
+        """PENDING and FAILED jobs, and RUNNING ones abandoned by their runner"""
+        from datetime import timedelta
+        from django.utils import timezone
+        cutoff = timezone.now() - timedelta(seconds=settings.RECATEGORIZATION_STALE_AFTER)
+        return cls.objects.filter(
+            models.Q(status__in=cls.CLAIMABLE)
+            | models.Q(status='RUNNING', heartbeat_at__lt=cutoff)
+            | models.Q(status='RUNNING', heartbeat_at__isnull=True, started_at__lt=cutoff)
+        )
+    
+    def claim(self):
+        """
+        Move a claimable job to RUNNING with a compare-and-swap UPDATE on its
+        status and heartbeat, so the API's worker and the recategorize command
+        never run the same job at once. Taking over a stale RUNNING job renews
+        its heartbeat, so the runner that abandoned it finds its claim gone if it
+        ever reports progress again. Returns False if the job is not claimable
+        or another runner got there first.
+        """
+        from django.utils import timezone
+        now = timezone.now()
+        fields = {'status': 'RUNNING', 'error': '', 'started_at': self.started_at or now, 'heartbeat_at': now}
+        updated = RecategorizationJob.claimable().filter(
+            pk=self.pk, status=self.status, heartbeat_at=self.heartbeat_at
+        ).update(**fields)
+        if updated:
+            for name, value in fields.items():
+                setattr(self, name, value)
+        return bool(updated)
+
+
+
+# ========================================
+# 9. MERCHANT RULE MODEL
+# ========================================
+class MerchantRule(models.Model):
+    """
+    A category chosen for a merchant, i.e. for every description with this
+    normalized form. Rules of a user win over global ones (user empty), and
+    both win over keyword scoring.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='merchant_rules', help_text='Empty for a rule applying to everyone'
+    )
+    merchant_key = models.CharField(max_length=500, help_text='normalize_description() of the merchant\'s descriptions')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='merchant_rules')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['merchant_key']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'merchant_key'], condition=models.Q(user__isnull=False),
+                name='expenses_merchant_rule_user_key'
+            ),
+            models.UniqueConstraint(
+                fields=['merchant_key'], condition=models.Q(user__isnull=True),
+                name='expenses_merchant_rule_global_key'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email if self.user else 'Everyone'}: {self.merchant_key} -> {self.category.name}"
+
+
+# ========================================
+# 10. SPENDING SUMMARY MODEL
+# ========================================
+class SpendingSummary(models.Model):
+    """
+    Running totals of a user's transactions: one row per statement, and one
+    (statement empty) over all of the user's statements. Kept up to date by
+    ingestion, category moves and statement deletion (see
+    expenses/summaries.py), so the dashboard summary reads a single row.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='spending_summaries')
+    statement = models.OneToOneField(
+        Statement, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='summary', help_text='Empty for the summary of all the user\'s statements'
+    )
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    count = models.PositiveIntegerField(default=0)
+    category_counts = models.JSONField(default=dict, help_text='Transactions per category id ("" for none)')
+    currency_counts = models.JSONField(default=dict, help_text='Transactions per currency')
+    first_date = models.DateField(null=True, blank=True)
+    last_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(statement__isnull=True),
+                name='expenses_spending_summary_user'
+            ),
+        ]
+    
+    @property
+    def currency(self):
+        """The currency most transactions are in (alphabetically first on a tie), None without any"""
+        if not self.currency_counts:
+            return None
+        return max(sorted(self.currency_counts), key=self.currency_counts.get)
+    
+    def __str__(self):
+        scope = f"statement {self.statement_id}" if self.statement_id else 'all statements'
+        return f"{self.user_id} {scope}: {self.total} over {self.count}"
@@ -0,0 +1,94 @@
+from base64 import b64decode, b64encode
+from collections import namedtuple
+from urllib import parse
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+# Date and id of the row a page stopped at; reverse pages walk back towards newer rows
+Cursor = namedtuple('Cursor', ['date', 'id', 'reverse'])
+
+
+def _position(row):
+    """(date, id) of a values() row or a Transaction"""
+    if isinstance(row, dict):
+        return row['date'], row['id']
+    return row.date, row.id
+
+
+class TransactionCursorPagination(CursorPagination):
+    """
+    Newest-first keyset pagination on (date, id). The cursor holds the date and
+    id of the last row shown, and the next page reads the rows strictly after it
+    in that order: date < d, or date = d and id < i. That is a range scan on the
+    (user, -date, -id) index, so a page costs the same however deep it is,
+    including within a day with more transactions than a page.
+    """
+    ordering = ('-date', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        if self.cursor is not None:
+            date, pk = self.cursor.date, self.cursor.id
+            if reverse:
+                queryset = queryset.filter(Q(date__gt=date) | Q(date=date, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+
+        ordering = ('date', 'id') if reverse else self.ordering
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            return self.encode_cursor(Cursor(*_position(self.page[-1]), reverse=False))
+        # An empty page going back: continue from where it started
+        return self.encode_cursor(self.cursor._replace(reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            return self.encode_cursor(Cursor(*_position(self.page[0]), reverse=True))
+        return self.encode_cursor(self.cursor._replace(reverse=True))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            date, pk = tokens['p'][0].split('|')
+            date = parse_date(date)
+            if date is None:
+                raise ValueError(date)
+            return Cursor(date, int(pk), bool(int(tokens.get('r', ['0'])[0])))
+        except (KeyError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        tokens = {'p': f'{cursor.date.isoformat()}|{cursor.id}'}
+        if cursor.reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(parse.urlencode(tokens).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -1,33 +1,48 @@
+import codecs
+import fitz
+import io
+import multiprocessing
 import pandas as pd
 import pdfplumber
 import re
-from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
 
 class StatementParser:
     """Base class for statement parsers"""
     
-   
+    # Bump whenever parsing output changes, so cached parses (see ingestion) are not reused
+    VERSION = 1
+    
+    def __init__(self):
+        # One date parser per parser instance, i.e. per statement
+        self.dates = DateParser()
+    
+    # 🔥 PRIORITIZE DD/MM/YYYY formats (most common in international CSVs)
+    DATE_FORMATS = [
+        '%d/%m/%Y',      # 30/10/2025 (DD/MM/YYYY) - YOUR FORMAT
+        '%d-%m-%Y',      # 30-10-2025
+        '%d/%m/%y',      # 30/10/25
+        '%d-%m-%y',      # 30-10-25
+        '%Y-%m-%d',      # 2025-10-30 (ISO format)
+        '%m/%d/%Y',      # 10/30/2025 (MM/DD/YYYY - US format)
+        '%m-%d-%Y',      # 10-30-2025
+        '%Y/%m/%d',      # 2025/10/30
+        '%b %d, %Y',     # Oct 30, 2025
+        '%B %d, %Y',     # October 30, 2025
+        '%m/%d/%y',      # 10/30/25
+        '%Y%m%d'         # 20251030
+    ]
+
     @staticmethod
-    def parse_date(date_str):
-        """Parse date from various formats"""
-        # 🔥 PRIORITIZE DD/MM/YYYY formats (most common in international CSVs)
-        date_formats = [
-            '%d/%m/%Y',      # 30/10/2025 (DD/MM/YYYY) - YOUR FORMAT
-            '%d-%m-%Y',      # 30-10-2025
-            '%d/%m/%y',      # 30/10/25
-            '%d-%m-%y',      # 30-10-25
-            '%Y-%m-%d',      # 2025-10-30 (ISO format)
-            '%m/%d/%Y',      # 10/30/2025 (MM/DD/YYYY - US format)
-            '%m-%d-%Y',      # 10-30-2025
-            '%Y/%m/%d',      # 2025/10/30
-            '%b %d, %Y',     # Oct 30, 2025
-            '%B %d, %Y',     # October 30, 2025
-            '%m/%d/%y',      # 10/30/25
-            '%Y%m%d'         # 20251030
-        ]
-        
-        for fmt in date_formats:
+    def parse_date(date_str, formats=None):
+        """
+        Parse date from various formats
+        formats: optional subset of DATE_FORMATS to try, in the same order
+        """
+        for fmt in formats or StatementParser.DATE_FORMATS:
             try:
                 return datetime.strptime(str(date_str).strip(), fmt).date()
             except (ValueError, AttributeError):
@@ -35,6 +50,45 @@ class StatementParser:
         
         raise ValueError(f"Unable to parse date: {date_str}")
 
+    def parse_batches(self, file_path, batch_size=1000):
+        """
+        Parse file_path and yield transactions in lists of at most batch_size.
+        Parsers that can stream override this; the default slices parse().
+        """
+        transactions = self.parse(file_path)
+        for start in range(0, len(transactions), batch_size):
+            yield transactions[start:start + batch_size]
+
+    @staticmethod
+    def parse_date_series(values):
+        """
+        Vectorized parse_date for a whole column.
+        Each format is applied with one pd.to_datetime call to the rows no
+        earlier format matched, so every row gets the same first-matching
+        format as parse_date. Rows pandas cannot represent (years outside
+        1677-2262) fall back to parse_date.
+        Returns: object Series of datetime.date, None where unparseable
+        """
+        strings = values.astype(str).str.strip()
+        dates = pd.Series(None, index=values.index, dtype=object)
+        remaining = strings
+
+        for fmt in StatementParser.DATE_FORMATS:
+            if remaining.empty:
+                break
+            parsed = pd.to_datetime(remaining, format=fmt, errors='coerce')
+            matched = parsed.notna()
+            if matched.any():
+                dates.loc[matched[matched].index] = parsed[matched].dt.date
+                remaining = remaining[~matched]
+
+        for index, value in remaining.items():
+            try:
+                dates.loc[index] = StatementParser.parse_date(value)
+            except ValueError:
+                continue
+
+        return dates
 
     @staticmethod
     def parse_amount(amount_str):
@@ -60,20 +114,194 @@ class StatementParser:
         except (InvalidOperation, ValueError):
             return None
 
+    @staticmethod
+    def parse_amount_series(values):
+        """
+        Vectorized parse_amount for a whole column.
+        Returns: object Series of Decimal, None where unparseable
+        """
+        strings = values.astype(str).str.strip()
+        strings = strings.str.replace(r'[€£¥₹$,\s]', '', regex=True)
+        
+        negative = strings.str.contains('(', regex=False) & strings.str.contains(')', regex=False)
+        strings = strings.where(~negative, '-' + strings.str.replace(r'[()]', '', regex=True))
+        
+        strings = strings.str.replace(r'[^\d.-]', '', regex=True)
+        
+        # Statements repeat amounts heavily, so convert each distinct string once
+        decimals = {}
+        for value in strings.unique():
+            try:
+                decimals[value] = abs(Decimal(value))
+            except (InvalidOperation, ValueError):
+                decimals[value] = None
+        
+        amounts = pd.Series([decimals[value] for value in strings], index=values.index, dtype=object)
+        amounts.loc[values.isna()] = None
+        return amounts
+
+
+# strptime's own regexes for the numeric directives, as token sets
+_DAY_TOKENS = {str(n) for n in range(1, 10)} | {f'{n:02d}' for n in range(1, 32)}
+_MONTH_TOKENS = {str(n) for n in range(1, 10)} | {f'{n:02d}' for n in range(1, 13)}
+_NUMERIC_DATE = re.compile(r'([0-9]+)([/-])([0-9]+)\2([0-9]+)')
+
+
+class DateParser:
+    """
+    Per-statement date parser giving the same results as StatementParser.parse_date
+    
+    - Exact strings are memoized in a bounded LRU (statements repeat dates a lot).
+    - ASCII numeric dates are checked against each format by hand, following
+      strptime's rules for %d/%m/%Y/%y, so no exceptions are raised per attempt.
+    - Other strings go through strptime, trying the format that last worked
+      first. US month-first formats are never promoted: an earlier DD/MM
+      format has to keep winning for ambiguous dates.
+    """
+    
+    CACHE_SIZE = 4096
+    MONTH_FIRST_FORMATS = {'%m/%d/%Y', '%m-%d-%Y', '%m/%d/%y'}
+    NUMERIC_FORMATS = {
+        '%d/%m/%Y': ('/', 'dmY'),
+        '%d-%m-%Y': ('-', 'dmY'),
+        '%d/%m/%y': ('/', 'dmy'),
+        '%d-%m-%y': ('-', 'dmy'),
+        '%Y-%m-%d': ('-', 'Ymd'),
+        '%m/%d/%Y': ('/', 'mdY'),
+        '%m-%d-%Y': ('-', 'mdY'),
+        '%Y/%m/%d': ('/', 'Ymd'),
+        '%m/%d/%y': ('/', 'mdy'),
+    }
+    
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.learned = None
+        self.hits = 0
+        self.misses = 0
+    
+    def parse(self, date_str, formats=None):
+        """
+        Parse date_str like StatementParser.parse_date
+        formats: optional tuple subset of DATE_FORMATS to try, in the same order
+        """
+        text = str(date_str).strip()
+        key = (text, formats)
+        
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            result = self.cache[key]
+        else:
+            self.misses += 1
+            result = self._parse(text, formats or StatementParser.DATE_FORMATS)
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        
+        if result is None:
+            raise ValueError(f"Unable to parse date: {date_str}")
+        return result
+    
+    def _parse(self, text, formats):
+        numeric = _NUMERIC_DATE.fullmatch(text)
+        if numeric:
+            for fmt in formats:
+                spec = self.NUMERIC_FORMATS.get(fmt)
+                if spec:
+                    result = self._parse_separated(numeric, *spec)
+                    if result:
+                        return result
+            return None
+        
+        if text.isascii() and text.isdigit():
+            return self._parse_compact(text) if '%Y%m%d' in formats else None
+        
+        order = list(formats)
+        if self.learned in order and self.learned not in self.MONTH_FIRST_FORMATS:
+            order.remove(self.learned)
+            order.insert(0, self.learned)
+        
+        for fmt in order:
+            try:
+                result = datetime.strptime(text, fmt).date()
+            except ValueError:
+                continue
+            self.learned = fmt
+            return result
+        return None
+    
+    @staticmethod
+    def _parse_separated(numeric, separator, fields):
+        if numeric.group(2) != separator:
+            return None
+        
+        values = {}
+        for field, token in zip(fields, (numeric.group(1), numeric.group(3), numeric.group(4))):
+            if field == 'd' and token not in _DAY_TOKENS:
+                return None
+            if field == 'm' and token not in _MONTH_TOKENS:
+                return None
+            if field == 'Y' and len(token) != 4:
+                return None
+            if field == 'y':
+                if len(token) != 2:
+                    return None
+                year = int(token)
+                values['Y'] = year + (2000 if year <= 68 else 1900)
+            else:
+                values[field] = int(token)
+        
+        try:
+            return date(values['Y'], values['m'], values['d'])
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def _parse_compact(text):
+        """
+        '%Y%m%d' exactly as strptime reads it: the first regex match wins
+        (month alternatives 1[0-2], 0[1-9], [1-9]; day 3[01], [12]\\d, 0[1-9], [1-9];
+        a one-digit month is tried if no day follows a two-digit one) and any
+        unconsumed digits make it fail.
+        """
+        year, rest = text[:4], text[4:]
+        if len(year) < 4:
+            return None
+        
+        for month_length in (2, 1):
+            month = rest[:month_length]
+            if len(month) != month_length or month not in _MONTH_TOKENS:
+                continue
+            day_digits = rest[month_length:]
+            for day_length in (2, 1):
+                day = day_digits[:day_length]
+                if len(day) == day_length and day in _DAY_TOKENS:
+                    if len(day_digits) != day_length:
+                        return None
+                    try:
+                        return date(int(year), int(month), int(day))
+                    except ValueError:
+                        return None
+        return None
+
 
 class CSVParser(StatementParser):
     """Parser for CSV credit card statements"""
     
+    ENCODINGS = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
+    SNIFF_BYTES = 64 * 1024
+    READ_CHUNK_ROWS = 10000
+    
     def parse(self, file_path):
         """
         Parse CSV file and return list of transactions
         Returns: list of dicts with keys: date, description, amount
         """
         try:
-            encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
             df = None
             
-            for encoding in encodings:
+            for encoding in self.ENCODINGS:
                 try:
                     df = pd.read_csv(file_path, encoding=encoding)
                     break
@@ -90,27 +318,94 @@ class CSVParser(StatementParser):
             if not all([date_col, desc_col, amount_col]):
                 raise ValueError("Unable to detect required columns in CSV")
             
-            transactions = []
-            for _, row in df.iterrows():
-                try:
-                    date = self.parse_date(row[date_col])
-                    description = str(row[desc_col]).strip()
-                    amount = self.parse_amount(row[amount_col])
-                    
-                    if date and description and amount and amount > 0:
-                        transactions.append({
-                            'date': date,
-                            'description': description,
-                            'amount': amount
-                        })
-                except (ValueError, KeyError):
-                    continue
+            return self._extract_transactions(df, date_col, desc_col, amount_col)
             
-            return transactions
+        except Exception as e:
+            raise ValueError(f"Error parsing CSV: {str(e)}")
+
+    def parse_batches(self, file_path, batch_size=1000):
+        """
+        Stream the CSV instead of loading it whole
+        Yields: lists of at most batch_size transaction dicts (same keys as parse)
+        
+        Encoding and header are sniffed once from the start of the file and the
+        rows are then read in chunks, so memory stays flat for any file size.
+        Columns are read as text so every chunk is interpreted the same way,
+        whatever types the rest of the file would have inferred.
+        """
+        try:
+            encoding, header = self._sniff(file_path)
+            
+            date_col = self._detect_column(header, ['date', 'transaction date', 'trans date', 'posting date'])
+            desc_col = self._detect_column(header, ['description', 'merchant', 'transaction', 'payee', 'details'])
+            amount_col = self._detect_column(header, ['amount', 'debit', 'charge', 'transaction amount', 'value'])
             
+            if not all([date_col, desc_col, amount_col]):
+                raise ValueError("Unable to detect required columns in CSV")
+            
+            # Column-wise parsing has a fixed cost per call, so read bigger chunks than we yield
+            chunk_rows = max(batch_size, self.READ_CHUNK_ROWS)
+            with pd.read_csv(file_path, encoding=encoding, dtype=str, chunksize=chunk_rows) as reader:
+                for chunk in reader:
+                    transactions = self._extract_transactions(chunk, date_col, desc_col, amount_col)
+                    for start in range(0, len(transactions), batch_size):
+                        yield transactions[start:start + batch_size]
+        
         except Exception as e:
             raise ValueError(f"Error parsing CSV: {str(e)}")
 
+    def _sniff(self, file_path):
+        """
+        Detect encoding and header. The encoding is confirmed by decoding the
+        whole file in blocks before any row is returned, so a non-UTF-8 byte
+        late in the file falls back to the next encoding, as parse() does,
+        instead of failing after batches were already inserted.
+        Returns: (encoding, empty DataFrame carrying the header columns)
+        """
+        for encoding in self.ENCODINGS:
+            decoder = codecs.getincrementaldecoder(encoding)()
+            text = None
+            try:
+                with open(file_path, 'rb') as csv_file:
+                    while True:
+                        block = csv_file.read(self.SNIFF_BYTES)
+                        decoded = decoder.decode(block, final=not block)
+                        if text is None:
+                            text = decoded
+                        if not block:
+                            break
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            raise ValueError("Unable to read CSV file with any supported encoding")
+        
+        return encoding, pd.read_csv(io.StringIO(text), nrows=0)
+
+    def _extract_transactions(self, df, date_col, desc_col, amount_col):
+        """Turn the detected columns into transaction dicts with column-wise operations"""
+        columns = {'date': df[date_col], 'description': df[desc_col], 'amount': df[amount_col]}
+        
+        # Row-wise access used to upcast all-numeric frames to one dtype (e.g. int dates to floats)
+        if not any(dtype == object for dtype in df.dtypes):
+            row_dtype = df.values.dtype
+            columns = {key: column.astype(row_dtype) for key, column in columns.items()}
+        
+        dates = self.parse_date_series(columns['date'])
+        descriptions = columns['description'].astype(str).str.strip()
+        amounts = self.parse_amount_series(columns['amount'])
+        
+        valid = (
+            dates.notna()
+            & (descriptions != '')
+            & amounts.map(lambda amount: amount is not None and amount > 0).astype(bool)
+        )
+        
+        return [
+            {'date': date, 'description': description, 'amount': amount}
+            for date, description, amount in zip(dates[valid], descriptions[valid], amounts[valid])
+        ]
+
     def _detect_column(self, df, possible_names):
         """Detect column name from possible variations"""
         columns_lower = {col.lower(): col for col in df.columns}
@@ -127,57 +422,167 @@ class CSVParser(StatementParser):
         return None
 
 
+# Text-statement line patterns, each with the DATE_FORMATS (in their original
+# order) that can possibly match its date group, so date parsing skips the rest
+TEXT_PATTERNS = [
+    (re.compile(r'(\d{1,2}/\d{1,2}/\d{2,4})\s+(.+?)\s+\$?([\d,]+\.\d{2})'),
+     ('%d/%m/%Y', '%d/%m/%y', '%m/%d/%Y', '%m/%d/%y')),
+    (re.compile(r'(\d{1,2}-\d{1,2}-\d{2,4})\s+(.+?)\s+([\d,]+\.\d{2})'),
+     ('%d-%m-%Y', '%d-%m-%y', '%m-%d-%Y')),
+    (re.compile(r'(\d{4}-\d{1,2}-\d{1,2})\s+(.+?)\s+([\d,]+\.\d{2})'),
+     ('%Y-%m-%d',)),
+]
+
+# Zero-width, so overlapping candidate starts are all reported
+TEXT_DATE_CANDIDATES = re.compile(r'(?=\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\s|\d{4}-\d{1,2}-\d{1,2}\s)')
+
+
+def _extract_page_range(file_path, start, stop, backend):
+    """
+    Process-pool task: open the PDF in the worker and extract pages [start, stop)
+    Returns: list of per-page transaction lists, in page order
+    """
+    return PDFParser(backend=backend)._extract_pages(file_path, start, stop)
+
+
 class PDFParser(StatementParser):
     """Parser for PDF credit card statements"""
     
+    # Text extraction engines. 'pymupdf' reads text with PyMuPDF and only
+    # falls back to pdfplumber (text + tables) on pages where it finds nothing.
+    BACKENDS = ('pymupdf', 'pdfplumber')
+    
+    # Below this many pages, process start-up costs more than it saves.
+    # PyMuPDF reads hundreds of pages a second, so it rarely needs the pool.
+    # pdfplumber (`benchmark pdf`): about 12 pages/s serially, and a spawn pool
+    # adds 0.9-1.4s with 2 workers and 1.8-2.6s with 4 before the first page,
+    # so one core per worker breaks even at about 22-34 pages with 2 workers
+    # and 29-42 with 4.
+    PARALLEL_MIN_PAGES = {'pymupdf': 200, 'pdfplumber': 40}
+    
+    def __init__(self, workers=1, backend='pymupdf'):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown PDF backend: {backend}")
+        super().__init__()
+        self.workers = max(1, workers)
+        self.backend = backend
+    
     def parse(self, file_path):
         """
         Parse PDF file and return list of transactions
         Returns: list of dicts with keys: date, description, amount
         """
-        transactions = []
-        
         try:
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        page_transactions = self._extract_transactions_from_text(text)
-                        transactions.extend(page_transactions)
-                    
-                    tables = page.extract_tables()
-                    for table in tables:
-                        table_transactions = self._extract_transactions_from_table(table)
-                        transactions.extend(table_transactions)
+            with fitz.open(file_path) as document:
+                page_count = document.page_count
             
+            if self.workers > 1 and page_count >= self.PARALLEL_MIN_PAGES[self.backend]:
+                pages = self._extract_pages_parallel(file_path, page_count)
+            else:
+                pages = self._extract_pages(file_path, 0, page_count)
+            
+            # Pages are merged in order, so dedup keeps the same first occurrence as a serial pass
             seen = set()
             unique_transactions = []
-            for t in transactions:
-                key = (t['date'], t['description'], t['amount'])
-                if key not in seen:
-                    seen.add(key)
-                    unique_transactions.append(t)
+            for page_transactions in pages:
+                for t in page_transactions:
+                    key = (t['date'], t['description'], t['amount'])
+                    if key not in seen:
+                        seen.add(key)
+                        unique_transactions.append(t)
             
             return unique_transactions
             
         except Exception as e:
             raise ValueError(f"Error parsing PDF: {str(e)}")
 
-    def _extract_transactions_from_text(self, text):
-        """Extract transactions from plain text using regex patterns"""
+    def _extract_pages(self, file_path, start, stop):
+        """
+        Extract pages [start, stop) with the configured backend
+        Returns: list of per-page transaction lists, in page order
+        """
+        if self.backend == 'pdfplumber':
+            with pdfplumber.open(file_path) as pdf:
+                return [self._extract_page(page) for page in pdf.pages[start:stop]]
+        
+        pages = []
+        fallback = []
+        with fitz.open(file_path) as document:
+            for number in range(start, stop):
+                # Reading order (top to bottom, left to right) like pdfplumber's
+                # extract_text, not the order the PDF happens to draw text in
+                text = document[number].get_text(sort=True)
+                transactions = self._extract_transactions_from_text(text) if text else []
+                if not transactions:
+                    fallback.append(number - start)
+                pages.append(transactions)
+        
+        # Only pages the fast text pass found nothing on pay for pdfplumber's table extraction
+        if fallback:
+            with pdfplumber.open(file_path) as pdf:
+                for index in fallback:
+                    pages[index] = self._extract_page(pdf.pages[start + index])
+        
+        return pages
+
+    def _extract_pages_parallel(self, file_path, page_count):
+        """
+        Split the document into contiguous page ranges, one per worker process
+        Returns: list of per-page transaction lists, in page order
+        """
+        workers = min(self.workers, page_count)
+        step = -(-page_count // workers)
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        
+        # spawn, not fork: the caller is usually a threaded web/ingestion worker
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=len(ranges), mp_context=context) as pool:
+            futures = [
+                pool.submit(_extract_page_range, file_path, start, stop, self.backend)
+                for start, stop in ranges
+            ]
+            return [page for future in futures for page in future.result()]
+
+    def _extract_page(self, page):
+        """Extract transactions from one pdfplumber page, text first, then tables"""
         transactions = []
         
-        patterns = [
-            r'(\d{1,2}/\d{1,2}/\d{2,4})\s+(.+?)\s+\$?([\d,]+\.\d{2})',
-            r'(\d{1,2}-\d{1,2}-\d{2,4})\s+(.+?)\s+([\d,]+\.\d{2})',
-            r'(\d{4}-\d{1,2}-\d{1,2})\s+(.+?)\s+([\d,]+\.\d{2})',
-        ]
+        text = page.extract_text()
+        if text:
+            transactions.extend(self._extract_transactions_from_text(text))
+        
+        for table in page.extract_tables():
+            transactions.extend(self._extract_transactions_from_table(table))
+        
+        return transactions
+
+    def _extract_transactions_from_text(self, text):
+        """
+        Extract transactions from plain text using regex patterns
+        
+        One lookahead scan finds every position where any pattern's date can
+        start; each pattern is then only tried there, resuming after its own
+        previous match exactly like a separate finditer pass per pattern.
+        Results keep that per-pattern order.
+        """
+        matches = [[] for _ in TEXT_PATTERNS]
+        next_start = [0] * len(TEXT_PATTERNS)
+        
+        for candidate in TEXT_DATE_CANDIDATES.finditer(text):
+            position = candidate.start()
+            for index, (pattern, _) in enumerate(TEXT_PATTERNS):
+                if position < next_start[index]:
+                    continue
+                match = pattern.match(text, position)
+                if match:
+                    matches[index].append(match)
+                    next_start[index] = match.end()
         
-        for pattern in patterns:
-            matches = re.finditer(pattern, text, re.MULTILINE)
-            for match in matches:
+        transactions = []
+        for (_, date_formats), pattern_matches in zip(TEXT_PATTERNS, matches):
+            for match in pattern_matches:
                 try:
-                    date = self.parse_date(match.group(1))
+                    date = self.dates.parse(match.group(1), date_formats)
                     description = match.group(2).strip()
                     amount = self.parse_amount(match.group(3))
                     
@@ -205,7 +610,7 @@ class PDFParser(StatementParser):
             
             for i in range(len(row) - 2):
                 try:
-                    date = self.parse_date(row[i])
+                    date = self.dates.parse(row[i])
                     description = str(row[i + 1]).strip() if row[i + 1] else ''
                     amount = self.parse_amount(row[i + 2])
                     
@@ -0,0 +1,179 @@
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .categorizer import ExpenseCategorizer, normalize_description
+from .models import MerchantRule, RecategorizationJob, Transaction
+from .registry import category_registry
+from . import dashboard_cache, rollups
+
+logger = logging.getLogger(__name__)
+
+# Transactions read, categorized and written per step (and per progress update)
+BATCH_SIZE = 5000
+
+# Distinct descriptions remembered across batches before the memo starts over
+MEMO_SIZE = 200000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Lazily start the single worker thread jobs run on. It is separate from the
+    ingestion pool, so a long job never holds up uploads, and jobs run one at a time.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recategorization')
+        return _executor
+
+
+def enqueue(job):
+    """
+    Run a PENDING job on the recategorization worker once it is committed, or
+    inline when STATEMENT_INGESTION_WORKERS = 0 turns background work off
+    """
+    if settings.STATEMENT_INGESTION_WORKERS <= 0:
+        run(job)
+        return
+    transaction.on_commit(lambda: get_executor().submit(run_job, job.pk))
+
+
+def run_job(job_id):
+    """Pool entry point: worker threads manage their own DB connections"""
+    close_old_connections()
+    try:
+        run(RecategorizationJob.objects.get(pk=job_id))
+    except Exception:
+        logger.exception('Recategorization job %s crashed', job_id)
+    finally:
+        close_old_connections()
+
+
+class ClaimLost(Exception):
+    """The job was taken over as stale, or deleted, while this runner was processing it"""
+
+    def __init__(self, job):
+        super().__init__(f'Recategorization job {job.pk} is no longer claimed by this runner')
+
+
+def _save(job, **fields):
+    """Save fields with a new heartbeat, as long as this runner still holds the claim"""
+    fields['heartbeat_at'] = timezone.now()
+    updated = RecategorizationJob.objects.filter(
+        pk=job.pk, status='RUNNING', heartbeat_at=job.heartbeat_at
+    ).update(**fields)
+    if not updated:
+        raise ClaimLost(job)
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def run(job, batch_size=BATCH_SIZE, progress=None):
+    """
+    Re-apply the categorizer to every transaction in the job's scope after
+    job.last_id, in id order.
+
+    Each description is categorized once per run (users' merchant rules are
+    looked up per batch), only rows whose category changes are written (one
+    UPDATE ... WHERE id IN per target category), and the rollups of moved rows
+    are adjusted in the same transaction as the update and the job's new last_id
+    and heartbeat. Dashboards of affected users are invalidated after every batch.
+    progress: optional callable, given the job after each batch
+    Returns: the job, COMPLETED or FAILED; None if it is not claimable, another
+    runner claimed it first, or another runner took it over as stale meanwhile
+    """
+    if not job.claim():
+        logger.info('Recategorization job %s is %s elsewhere, not running it', job.pk, job.status)
+        return None
+
+    # Keywords may have been edited in another process
+    category_registry.invalidate()
+    categorizer = ExpenseCategorizer()
+    memo = {}
+
+    transactions = Transaction.objects.order_by('pk')
+    if job.user_id:
+        transactions = transactions.filter(user_id=job.user_id)
+
+    try:
+        while True:
+            rows = list(transactions.filter(pk__gt=job.last_id).values_list(
+                'pk', 'user_id', 'description', 'category_id'
+            )[:batch_size])
+            if not rows:
+                break
+
+            unknown = list({description for _, _, description, _ in rows if description not in memo})
+            if len(memo) + len(unknown) > MEMO_SIZE:
+                memo.clear()
+                unknown = list({description for _, _, description, _ in rows})
+            categories = categorizer.categorize_bulk([{'description': description} for description in unknown])
+            memo.update((description, category.id) for description, category in zip(unknown, categories))
+
+            # The categorizer applies global merchant rules; users' own rules go on top
+            user_rules = {
+                (user_id, merchant_key): category_id
+                for user_id, merchant_key, category_id in MerchantRule.objects.filter(
+                    user_id__in={user_id for _, user_id, _, _ in rows}
+                ).values_list('user_id', 'merchant_key', 'category_id')
+            }
+            ruled_users = {user_id for user_id, _ in user_rules}
+
+            moves = defaultdict(list)
+            users = set()
+            for pk, user_id, description, category_id in rows:
+                new_category_id = memo[description]
+                if user_id in ruled_users:
+                    new_category_id = user_rules.get((user_id, normalize_description(description)), new_category_id)
+                if new_category_id != category_id:
+                    moves[new_category_id].append(pk)
+                    users.add(user_id)
+
+            def update():
+                for category_id, ids in moves.items():
+                    Transaction.objects.filter(pk__in=ids).update(category_id=category_id)
+
+            with transaction.atomic():
+                if moves:
+                    changed = [pk for ids in moves.values() for pk in ids]
+                    rollups.move_transactions(Transaction.objects.filter(pk__in=changed), update)
+                # Checks the claim in the batch's transaction, so a batch of a
+                # job taken over meanwhile rolls back
+                _save(
+                    job, last_id=rows[-1][0], rows_scanned=job.rows_scanned + len(rows),
+                    rows_changed=job.rows_changed + sum(len(ids) for ids in moves.values())
+                )
+
+            for user_id in users:
+                dashboard_cache.bump_user_version(user_id)
+            if progress:
+                progress(job)
+
+        outcome = {'status': 'COMPLETED'}
+    except ClaimLost:
+        logger.warning('Recategorization job %s was taken over by another runner', job.pk)
+        return None
+    except Exception as e:
+        logger.warning('Recategorization job %s failed: %s', job.pk, e)
+        outcome = {'status': 'FAILED', 'error': str(e)}
+    except KeyboardInterrupt:
+        # Leave the job resumable rather than RUNNING until it goes stale
+        try:
+            _save(job, status='FAILED', error='Interrupted', finished_at=timezone.now())
+        except ClaimLost:
+            pass
+        raise
+
+    try:
+        _save(job, finished_at=timezone.now(), **outcome)
+    except ClaimLost:
+        logger.warning('Recategorization job %s was taken over by another runner', job.pk)
+        return None
+    return job
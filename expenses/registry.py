@@ -0,0 +1,119 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Category
+
+DISPLAY_NAMES = dict(Category.CATEGORY_CHOICES)
+
+_VERSION_KEY = 'categories:version'
+
+
+def _shared_version():
+    """
+    Registry version published to every process. Like the dashboard versions it
+    starts from the clock, so a value evicted from the cache never comes back smaller.
+    """
+    cache = caches[settings.CATEGORY_REGISTRY_CACHE]
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(_VERSION_KEY)
+    return version
+
+
+def _bump_shared_version():
+    cache = caches[settings.CATEGORY_REGISTRY_CACHE]
+    try:
+        return cache.incr(_VERSION_KEY)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(_VERSION_KEY, version, timeout=None)
+        return version
+
+
+class CategoryRegistry:
+    """
+    Process-wide, read-only view of the Category table.
+
+    Loaded with one query on first use and indexed by id and by name. Saving or
+    deleting a Category drops it (see the signal handlers below) and bumps the
+    version in settings.CATEGORY_REGISTRY_CACHE; other processes compare
+    against it at most every CATEGORY_REGISTRY_CHECK_INTERVAL seconds and
+    reload once it moved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        # Changes on every invalidation, so a load that raced with one is not kept
+        self._version = None
+        self._checked_at = None
+
+    @property
+    def version(self):
+        """Version of the categories; cached results tagged with another one are stale"""
+        self._refresh()
+        return self._version
+
+    def _refresh(self):
+        """Drop the snapshot if another process invalidated the registry since the last check"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < settings.CATEGORY_REGISTRY_CHECK_INTERVAL:
+            return
+        version = _shared_version()
+        with self._lock:
+            self._checked_at = now
+            if version != self._version:
+                self._version = version
+                self._snapshot = None
+
+    def _get(self):
+        self._refresh()
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                version = self._version
+            categories = list(Category.objects.all())
+            snapshot = (
+                categories,
+                {category.id: category for category in categories},
+                {category.name: category for category in categories},
+            )
+            with self._lock:
+                if version == self._version:
+                    self._snapshot = snapshot
+        return snapshot
+
+    def all(self):
+        """Returns: list of Category instances in the model's ordering"""
+        return self._get()[0]
+
+    def by_id(self, category_id):
+        return self._get()[1].get(category_id)
+
+    def by_name(self, name):
+        return self._get()[2].get(name)
+
+    def display_name(self, name):
+        """Human-readable name for a category name, like get_name_display()"""
+        return DISPLAY_NAMES.get(name, name)
+
+    def invalidate(self):
+        """Drop the snapshot here and, through the shared version, in every other process"""
+        version = _bump_shared_version()
+        with self._lock:
+            self._version = version
+            self._checked_at = time.monotonic()
+            self._snapshot = None
+
+
+category_registry = CategoryRegistry()
+
+
+@receiver(post_save, sender=Category, dispatch_uid='category_registry_save')
+@receiver(post_delete, sender=Category, dispatch_uid='category_registry_delete')
+def invalidate_category_registry(sender, **kwargs):
+    category_registry.invalidate()
@@ -0,0 +1,245 @@
+import calendar
+from collections import Counter
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractWeekDay, Round, TruncMonth
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils.dateparse import parse_date
+from .models import Category, SpendingRollup, Statement, Transaction
+from . import summaries
+
+# Grouping of a rollup row; TruncMonth/ExtractWeekDay match what the dashboards use
+KEY_FIELDS = ('user_id', 'statement_id', 'account_id', 'category_id', 'month', 'weekday')
+CATEGORY = KEY_FIELDS.index('category_id')
+
+
+def _grouped(transactions):
+    return transactions.annotate(
+        month=TruncMonth('date'), weekday=ExtractWeekDay('date')
+    ).values(*KEY_FIELDS).annotate(total=Sum('amount'), count=Count('id')).order_by()
+
+
+def _key(row):
+    if isinstance(row, dict):
+        return tuple(row[field] for field in KEY_FIELDS)
+    return tuple(getattr(row, field) for field in KEY_FIELDS)
+
+
+def _apply(rows, sign=1, deltas=None):
+    """Accumulate sign * (total, count) of grouped rows per rollup key"""
+    deltas = {} if deltas is None else deltas
+    for row in rows:
+        delta = deltas.setdefault(_key(row), [0, 0])
+        delta[0] += sign * row['total']
+        delta[1] += sign * row['count']
+    return deltas
+
+
+def _save(deltas):
+    """
+    Add per-key (total, count) deltas to the rollups, creating and deleting rows
+    as needed. Call inside an atomic block: concurrent writers to the same
+    statements wait for each other on the statement rows, which also covers
+    rollups that do not exist yet (and that NULL keys keep unique_together from
+    guarding), then read-modify-write locked rollups.
+    """
+    statement_ids = sorted({key[1] for key in deltas})
+    list(Statement.objects.select_for_update().filter(pk__in=statement_ids).order_by('pk').values_list('pk'))
+    existing = {
+        _key(rollup): rollup
+        for rollup in SpendingRollup.objects.select_for_update().filter(statement_id__in=statement_ids)
+    }
+    created, updated, emptied = [], [], []
+    for key, (total, count) in deltas.items():
+        if not count and not total:
+            continue
+        rollup = existing.get(key)
+        if rollup:
+            rollup.total += total
+            rollup.count += count
+            (updated if rollup.count > 0 else emptied).append(rollup)
+        else:
+            created.append(SpendingRollup(**dict(zip(KEY_FIELDS, key)), total=total, count=count))
+
+    SpendingRollup.objects.bulk_create(created)
+    SpendingRollup.objects.bulk_update(updated, ['total', 'count'])
+    SpendingRollup.objects.filter(pk__in=[rollup.pk for rollup in emptied]).delete()
+
+
+def add_transactions(statement, transactions):
+    """
+    Fold freshly inserted transactions of one statement into its rollups.
+    Call in the same atomic block as the insert. The sums come from the database,
+    so they are rounded exactly like an aggregate over the raw rows.
+    """
+    ids = [trans.pk for trans in transactions]
+    if not ids:
+        return
+    if None in ids:
+        # Backend did not return primary keys from bulk_create
+        rebuild(statement)
+        return
+    _save(_apply(_grouped(Transaction.objects.filter(pk__in=ids))))
+
+
+def move_transactions(transactions, update):
+    """
+    Keep the rollups in step while update() changes the category (or any other
+    grouping field) of a queryset of transactions: their old totals are taken
+    out and their new ones added back. The category counts of the spending
+    summaries follow. The queryset must select the same rows before and after
+    the update. Call inside an atomic block.
+    """
+    deltas = _apply(_grouped(transactions), sign=-1)
+    update()
+    _save(_apply(_grouped(transactions), deltas=deltas))
+    summaries.move_categories(
+        (user_id, statement_id, category_id, count)
+        for (user_id, statement_id, _, category_id, _, _), (_, count) in deltas.items() if count
+    )
+
+
+@receiver(pre_delete, sender=Category, dispatch_uid='spending_rollup_category_delete')
+def _category_deleted(sender, instance, **kwargs):
+    """
+    Fold the category's rollups into the uncategorized ones. Left to SET_NULL
+    they could duplicate an existing (statement, account, NULL, month, weekday)
+    row, and later deltas would only reach one of the two.
+    Runs inside the deletion's transaction, before the foreign keys are cleared.
+    """
+    rollups = SpendingRollup.objects.filter(category=instance)
+    deltas = {}
+    for rollup in rollups.select_for_update():
+        key = _key(rollup)
+        delta = deltas.setdefault(key[:CATEGORY] + (None,) + key[CATEGORY + 1:], [0, 0])
+        delta[0] += rollup.total
+        delta[1] += rollup.count
+    rollups.delete()
+    _save(deltas)
+
+
+def rebuild(statement):
+    """Recompute a statement's rollups from its transactions. Call inside an atomic block."""
+    remove(statement)
+    SpendingRollup.objects.bulk_create([
+        SpendingRollup(**row) for row in _grouped(Transaction.objects.filter(statement=statement))
+    ])
+
+
+def remove(statement):
+    SpendingRollup.objects.filter(statement=statement).delete()
+
+
+def _cents(total):
+    # SQLite adds decimals up as floats
+    return Decimal(str(total)).quantize(Decimal('0.01'))
+
+
+def rebuild_all(user_id=None, commit=True):
+    """
+    Recompute rollups from the transactions, of everyone or of one user, and
+    compare them with the stored ones.
+    commit: replace the stored rollups with the recomputed ones
+    Returns: list of (rollup key, stored (total, count), recomputed (total, count));
+    a key stored in more than one row is listed even if the rows add up
+    """
+    transactions = Transaction.objects.all()
+    stored = SpendingRollup.objects.all()
+    if user_id is not None:
+        transactions = transactions.filter(user_id=user_id)
+        stored = stored.filter(user_id=user_id)
+
+    with transaction.atomic():
+        stored = list(stored.select_for_update())
+        # Rows sharing a key (NULL categories are not kept unique) add up
+        totals, copies = {}, Counter()
+        for rollup in stored:
+            total = totals.setdefault(_key(rollup), [Decimal('0.00'), 0])
+            total[0] += rollup.total
+            total[1] += rollup.count
+            copies[_key(rollup)] += 1
+        rebuilt = {_key(row): row for row in _grouped(transactions)}
+
+        drift = []
+        for key in sorted(totals.keys() | rebuilt.keys(), key=lambda key: tuple(str(part) for part in key)):
+            before = tuple(totals[key]) if key in totals else (Decimal('0.00'), 0)
+            after = (_cents(rebuilt[key]['total']), rebuilt[key]['count']) if key in rebuilt else (Decimal('0.00'), 0)
+            if before != after or copies[key] > 1:
+                drift.append((key, before, after))
+
+        if commit:
+            SpendingRollup.objects.filter(pk__in=[rollup.pk for rollup in stored]).delete()
+            SpendingRollup.objects.bulk_create([SpendingRollup(**row) for row in rebuilt.values()])
+    return drift
+
+
+def _month_bounds(start_date, end_date):
+    """
+    (first month, last month) selected by a start/end date filter, or None when
+    a bound falls inside a month or is not a date the raw filter would accept
+    """
+    try:
+        start = parse_date(start_date) if start_date else None
+        end = parse_date(end_date) if end_date else None
+    except ValueError:
+        return None
+    if (start_date and start is None) or (end_date and end is None):
+        return None
+    if start and start.day != 1:
+        return None
+    if end and end.day != calendar.monthrange(end.year, end.month)[1]:
+        return None
+    return start, end.replace(day=1) if end else None
+
+
+class SpendingSource:
+    """
+    The rows a dashboard aggregates for statement_id/start_date/end_date filters:
+    the user's rollups when the dates line up with whole months, their raw
+    transactions otherwise. Both expose the same aggregate expressions, so
+    results are identical whichever one is used. Totals are rounded to cents:
+    SQLite sums decimals as floats, and the two sources add them up in a
+    different order.
+    """
+
+    def __init__(self, user, statement_id=None, start_date=None, end_date=None):
+        transactions = Transaction.objects.filter(user=user)
+        if statement_id:
+            transactions = transactions.filter(statement_id=statement_id)
+
+        bounds = _month_bounds(start_date, end_date) if settings.DASHBOARD_USE_ROLLUPS else None
+        if start_date:
+            transactions = transactions.filter(date__gte=start_date)
+        if end_date:
+            transactions = transactions.filter(date__lte=end_date)
+        self.transactions = transactions
+
+        self.from_rollups = bounds is not None
+        if self.from_rollups:
+            rollups = SpendingRollup.objects.filter(user=user)
+            if statement_id:
+                rollups = rollups.filter(statement_id=statement_id)
+            first_month, last_month = bounds
+            if first_month:
+                rollups = rollups.filter(month__gte=first_month)
+            if last_month:
+                rollups = rollups.filter(month__lte=last_month)
+            self.queryset = rollups
+            self.total = Round(Sum('total'), 2)
+            self.count = Sum('count')
+            self.month = F('month')
+            self.weekday = F('weekday')
+        else:
+            self.queryset = transactions
+            self.total = Round(Sum('amount'), 2)
+            self.count = Count('id')
+            self.month = TruncMonth('date')
+            self.weekday = ExtractWeekDay('date')
+
+    def totals(self):
+        """Returns: (total amount or None, number of transactions)"""
+        result = self.queryset.aggregate(total=self.total, count=self.count)
+        return result['total'], result['count'] or 0
@@ -1,9 +1,12 @@
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from .models import Statement, Transaction, Category, PasswordResetToken
 from rest_framework import serializers
-from .models import User, Account, Statement, Transaction, Category
+from .models import User, Account, Statement, Transaction, Category, RecategorizationJob, MerchantRule
+from .categorizer import normalize_description
+from .registry import category_registry
 
 User = get_user_model()
 
@@ -49,24 +52,154 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ('id', 'name', 'display_name', 'description')
 
+class TransactionListSerializer(serializers.ListSerializer):
+    """
+    Read-only list mode of TransactionSerializer. Given rows of
+    queryset.values(*TransactionSerializer.VALUES) it builds each item directly,
+    skipping the per-field machinery; the output is the same as serializing the
+    model instances. Model instances still go through the regular path.
+    """
+
+    def to_representation(self, data):
+        if not isinstance(data, list) or not data or not isinstance(data[0], dict):
+            return super().to_representation(data)
+
+        fields = self.child.fields
+        display_name = category_registry.display_name
+        created_at = self._datetime_formatter(fields['created_at']) if 'created_at' in fields else None
+        items = []
+        for row in data:
+            item = {
+                'id': row['id'],
+                'date': row['date'].isoformat(),
+                'description': row['description'],
+                'amount': format(row['amount'], 'f'),
+                'currency': row['currency'],
+            }
+            if row['category_id'] is not None:
+                item['category_id'] = row['category_id']
+                item['category_name'] = display_name(row['category__name'])
+            item['created_at'] = created_at(row['created_at']) if created_at else None
+            if len(fields) < len(TransactionSerializer.Meta.fields):
+                item = {name: item[name] for name in fields if name in item}
+            items.append(item)
+        return items
+
+    @staticmethod
+    def _datetime_formatter(field):
+        """DateTimeField.to_representation for aware datetimes, minus the per-call settings lookups"""
+        if getattr(field, 'format', api_settings.DATETIME_FORMAT) != ISO_8601:
+            return field.to_representation
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+        def represent(value):
+            if field_timezone is not None:
+                value = value.astimezone(field_timezone)
+            value = value.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return represent
+
+
 class TransactionSerializer(serializers.ModelSerializer):
-    category_name = serializers.CharField(source='category.get_name_display', read_only=True)
-    category_id = serializers.IntegerField(source='category.id', read_only=True)
+    """
+    Supports sparse output: a comma-separated ?fields= on the request keeps only
+    the listed fields (unknown names are ignored).
+    """
+    category_name = serializers.SerializerMethodField()
+    category_id = serializers.IntegerField(read_only=True)
+
+    # Columns TransactionListSerializer reads from queryset.values()
+    VALUES = ('id', 'date', 'description', 'amount', 'currency', 'category_id', 'category__name', 'created_at')
     
     class Meta:
         model = Transaction
         fields = ('id', 'date', 'description', 'amount', 'currency', 'category_id', 
                  'category_name', 'created_at')
         read_only_fields = ('id', 'created_at')
+        list_serializer_class = TransactionListSerializer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = request.query_params.get('fields') if request else None
+        if requested:
+            keep = {name.strip() for name in requested.split(',')}
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.category_id is None:
+            # Left out, as the original category.id and category.get_name_display
+            # sources did for a transaction without a category
+            data.pop('category_id', None)
+            data.pop('category_name', None)
+        return data
+
+    def get_category_name(self, obj):
+        # Uses the select_related category and the static choices map
+        if obj.category_id is None:
+            return None
+        return category_registry.display_name(obj.category.name)
 
 class StatementSerializer(serializers.ModelSerializer):
     transaction_count = serializers.IntegerField(read_only=True)
+    processed = serializers.BooleanField(read_only=True)
     
     class Meta:
         model = Statement
         fields = ('id', 'file_name', 'file_type', 'currency', 'uploaded_at', 
-                 'processed', 'transaction_count')
-        read_only_fields = ('id', 'uploaded_at', 'processed')
+                 'processed', 'status', 'transaction_count')
+        read_only_fields = ('id', 'uploaded_at', 'processed', 'status')
+
+class StatementStatusSerializer(serializers.ModelSerializer):
+    processed = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = Statement
+        fields = ('id', 'status', 'processed', 'rows_parsed', 'rows_categorized',
+                 'rows_inserted', 'rows_duplicate', 'error', 'started_at', 'finished_at')
+        read_only_fields = fields
+
+class RecategorizationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RecategorizationJob
+        fields = ('id', 'user', 'status', 'last_id', 'rows_scanned', 'rows_changed', 'error',
+                 'created_at', 'started_at', 'finished_at')
+        read_only_fields = ('id', 'status', 'last_id', 'rows_scanned', 'rows_changed', 'error',
+                           'created_at', 'started_at', 'finished_at')
+
+class MerchantRuleSerializer(serializers.ModelSerializer):
+    """Takes any description of the merchant; the rule matches its normalized form"""
+    description = serializers.CharField(write_only=True, max_length=500)
+    is_global = serializers.BooleanField(write_only=True, default=False)
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    
+    class Meta:
+        model = MerchantRule
+        fields = ('id', 'merchant_key', 'description', 'category', 'category_name', 'is_global', 'user',
+                 'created_at', 'updated_at')
+        read_only_fields = ('id', 'merchant_key', 'user', 'created_at', 'updated_at')
+    
+    def validate(self, attrs):
+        merchant_key = normalize_description(attrs.pop('description'))
+        if not merchant_key:
+            raise serializers.ValidationError({'description': 'Nothing left to match once dates and numbers are removed.'})
+        request = self.context['request']
+        is_global = attrs.pop('is_global')
+        if is_global and not request.user.is_staff:
+            raise serializers.ValidationError({'is_global': 'Only staff can set rules for everyone.'})
+        attrs['merchant_key'] = merchant_key
+        attrs['user'] = None if is_global else request.user
+        return attrs
+    
+    def create(self, validated_data):
+        # Setting a rule for a merchant that already has one replaces its category
+        rule, _ = MerchantRule.objects.update_or_create(
+            user=validated_data['user'], merchant_key=validated_data['merchant_key'],
+            defaults={'category': validated_data['category']}
+        )
+        return rule
 
 class PasswordResetRequestSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -0,0 +1,188 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Round
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from .models import Category, SpendingSummary, Statement, Transaction
+
+# Fields compared between stored and rebuilt summaries
+FIELDS = ('total', 'count', 'category_counts', 'currency_counts', 'first_date', 'last_date')
+
+
+def _category_key(category_id):
+    """JSON object key of a category id"""
+    return '' if category_id is None else str(category_id)
+
+
+def _empty(model, user_id=None, statement_id=None):
+    return model(
+        user_id=user_id, statement_id=statement_id, total=Decimal('0.00'), count=0,
+        category_counts={}, currency_counts={}, first_date=None, last_date=None
+    )
+
+
+def _add(summary, other, sign=1):
+    """
+    Add (sign=1) or take out (sign=-1) another summary's transactions.
+    Dates only widen: after taking rows out they have to be recomputed.
+    """
+    summary.total += sign * other.total
+    summary.count += sign * other.count
+    for field in ('category_counts', 'currency_counts'):
+        counts = dict(getattr(summary, field))
+        for key, count in getattr(other, field).items():
+            counts[key] = counts.get(key, 0) + sign * count
+        setattr(summary, field, {key: count for key, count in counts.items() if count})
+    if sign > 0:
+        summary.first_date = min(filter(None, [summary.first_date, other.first_date]), default=None)
+        summary.last_date = max(filter(None, [summary.last_date, other.last_date]), default=None)
+
+
+def grouped(transactions):
+    """
+    Totals of transactions per (user, statement, category, currency). Sums are
+    rounded to cents in the query: SQLite adds decimals up as floats.
+    """
+    return transactions.values('user_id', 'statement_id', 'category_id', 'currency').annotate(
+        total=Round(Sum('amount'), 2), count=Count('id'), first_date=Min('date'), last_date=Max('date')
+    ).order_by()
+
+
+def summarize(rows):
+    """
+    Fold grouped() rows into unsaved summaries, per statement and per user.
+    Returns: dict of (user_id, statement_id or None) -> summary
+    """
+    summaries = {}
+    for row in rows:
+        delta = SpendingSummary(
+            total=row['total'], count=row['count'],
+            category_counts={_category_key(row['category_id']): row['count']},
+            currency_counts={row['currency']: row['count']},
+            first_date=row['first_date'], last_date=row['last_date']
+        )
+        for key in ((row['user_id'], row['statement_id']), (row['user_id'], None)):
+            if key not in summaries:
+                summaries[key] = _empty(SpendingSummary, *key)
+            _add(summaries[key], delta)
+    return summaries
+
+
+def _locked(user_id, statement_id):
+    """The stored summary, created if missing, locked until the end of the transaction"""
+    return SpendingSummary.objects.select_for_update().get_or_create(user_id=user_id, statement_id=statement_id)[0]
+
+
+def _save(deltas):
+    """Add unsaved per-key summaries to the stored ones. Call inside an atomic block."""
+    for (user_id, statement_id), delta in deltas.items():
+        summary = _locked(user_id, statement_id)
+        _add(summary, delta)
+        summary.save()
+
+
+def add_transactions(statement, transactions):
+    """
+    Add freshly inserted transactions of one statement to its summary and its
+    user's. Call in the same atomic block as the insert.
+    """
+    ids = [trans.pk for trans in transactions]
+    if not ids:
+        return
+    if None in ids:
+        # Backend did not return primary keys from bulk_create
+        remove(statement)
+        _save(summarize(grouped(Transaction.objects.filter(statement=statement))))
+        return
+    _save(summarize(grouped(Transaction.objects.filter(pk__in=ids))))
+
+
+def move_categories(changes):
+    """
+    Shift category counts after transactions changed category.
+    changes: iterable of (user_id, statement_id, category_id, change in count)
+    Call inside an atomic block.
+    """
+    deltas = {}
+    for user_id, statement_id, category_id, count in changes:
+        for key in ((user_id, statement_id), (user_id, None)):
+            if key not in deltas:
+                deltas[key] = _empty(SpendingSummary, *key)
+            counts = deltas[key].category_counts
+            category = _category_key(category_id)
+            counts[category] = counts.get(category, 0) + count
+    _save(deltas)
+
+
+def remove(statement):
+    """
+    Take a statement's transactions out of its user's summary and drop the
+    statement's own. Call inside an atomic block.
+    """
+    summary = SpendingSummary.objects.select_for_update().filter(statement=statement).first()
+    if summary is None:
+        return
+    user_summary = _locked(statement.user_id, None)
+    _add(user_summary, summary, sign=-1)
+    dates = SpendingSummary.objects.filter(
+        user_id=statement.user_id, statement__isnull=False
+    ).exclude(pk=summary.pk).aggregate(first=Min('first_date'), last=Max('last_date'))
+    user_summary.first_date, user_summary.last_date = dates['first'], dates['last']
+    user_summary.save()
+    summary.delete()
+
+
+@receiver(pre_delete, sender=Statement, dispatch_uid='spending_summary_statement_delete')
+def _statement_deleted(sender, instance, **kwargs):
+    # Runs inside the deletion's transaction, before the summary row cascades away
+    remove(instance)
+
+
+@receiver(pre_delete, sender=Category, dispatch_uid='spending_summary_category_delete')
+def _category_deleted(sender, instance, **kwargs):
+    # SET_NULL leaves its transactions uncategorized: move their counts to ''
+    key = _category_key(instance.pk)
+    move_categories(
+        change
+        for user_id, statement_id, counts in SpendingSummary.objects.filter(
+            statement__isnull=False, category_counts__has_key=key
+        ).values_list('user_id', 'statement_id', 'category_counts')
+        for change in ((user_id, statement_id, instance.pk, -counts[key]), (user_id, statement_id, None, counts[key]))
+    )
+
+
+def get(user, statement_id=None):
+    """The user's summary of one statement, or of all of them; None if there is none"""
+    return SpendingSummary.objects.filter(user=user, statement_id=statement_id or None).first()
+
+
+def rebuild(user_id=None, commit=True):
+    """
+    Recompute summaries from the transactions, of everyone or of one user, and
+    compare them with the stored ones.
+    commit: replace the stored summaries with the recomputed ones
+    Returns: list of (user_id, statement_id, field, stored value, recomputed value)
+    """
+    transactions = Transaction.objects.all()
+    stored = SpendingSummary.objects.all()
+    if user_id is not None:
+        transactions = transactions.filter(user_id=user_id)
+        stored = stored.filter(user_id=user_id)
+
+    with transaction.atomic():
+        stored = {(summary.user_id, summary.statement_id): summary for summary in stored.select_for_update()}
+        rebuilt = summarize(grouped(transactions))
+
+        drift = []
+        for key in sorted(stored.keys() | rebuilt.keys(), key=lambda key: (key[0], key[1] or 0)):
+            before = stored.get(key) or _empty(SpendingSummary, *key)
+            after = rebuilt.get(key) or _empty(SpendingSummary, *key)
+            for field in FIELDS:
+                if getattr(before, field) != getattr(after, field):
+                    drift.append((*key, field, getattr(before, field), getattr(after, field)))
+
+        if commit:
+            SpendingSummary.objects.filter(pk__in=[summary.pk for summary in stored.values()]).delete()
+            SpendingSummary.objects.bulk_create(rebuilt.values())
+    return drift
@@ -1 +1,948 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from . import dashboard_cache, ingestion, merchant_rules, recategorization, rollups
+from .categorizer import ExpenseCategorizer, category_cache, normalize_description, shutdown_pool
+from .dashboard import Dashboard
+from .models import (
+    Category, MerchantRule, RecategorizationJob, SpendingRollup, SpendingSummary, Statement, Transaction, User
+)
+from .parsers import CSVParser, DateParser, PDFParser, StatementParser
+from .registry import CategoryRegistry, category_registry
+from .serializers import TransactionSerializer
+from .testing import (
+    legacy_categorize, legacy_extract_text, legacy_parse_csv, sample_date_strings, sample_descriptions,
+    sample_page_text, write_sample_pdf, write_sample_table_pdf
+)
+
+
+def write_csv(content):
+    """Write bytes to a temporary .csv file; the caller unlinks it"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as csv_file:
+        csv_file.write(content)
+    return csv_file.name
+
+
+class CSVParserTests(TestCase):
+
+    def test_parse_batches_falls_back_on_late_non_utf8_byte(self):
+        rows = [b'2024-01-%02d,COFFEE SHOP %d,%d.50' % (i % 28 + 1, i, i % 90 + 1) for i in range(5000)]
+        rows.append('2024-02-01,CAF\xc9 LATIN,12.00'.encode('latin-1'))
+        path = write_csv(b'Date,Description,Amount\n' + b'\n'.join(rows) + b'\n')
+        try:
+            self.assertGreater(os.path.getsize(path), CSVParser.SNIFF_BYTES)
+            streamed = [row for batch in CSVParser().parse_batches(path, 1000) for row in batch]
+            self.assertEqual(len(streamed), 5001)
+            self.assertEqual(streamed[-1]['description'], 'CAF\xc9 LATIN')
+            self.assertEqual(streamed, CSVParser().parse(path))
+        finally:
+            os.unlink(path)
+
+    def test_matches_row_by_row_parse(self):
+        rows = [
+            # Day first and month first, ambiguous or not, and other formats in the same column
+            '03/04/2024,CORNER BAKERY,3.10', '13/04/2024,FUEL STOP,40.00', '04/13/2024,BOOKSHOP,12.00',
+            '2024-04-05,TRAIN TICKET,7.80', '"Apr 6, 2024",CINEMA,11.00', '07-04-2024,PHARMACY,5.25',
+            '08/04/24,MARKET,6.40', '20240409,TAXI,14.00',
+            # Parenthesised, currency-symbol and thousands-separated amounts
+            '10/04/2024,REFUND,(12.50)', '11/04/2024,HOTEL,"$1,234.56"', '12/04/2024,LUNCH,€9.99',
+            '14/04/2024,NEWSAGENT,£3', '15/04/2024,RETURN,-4.00', '16/04/2024,ZERO,0.00',
+            # Blank and unparseable rows
+            ',,', '17/04/2024,,8.00', '18/04/2024,  ,8.00', 'pending,SUBSCRIPTION,9.00',
+            '31/02/2024,NO SUCH DAY,2.00', '19/04/2024,GIFT SHOP,n/a', '20/04/2024,GROCER,',
+        ]
+        # The second header names no column exactly: each is found by its partial match
+        for header in ('Date,Description,Amount', 'Txn Posting Date (UTC),Merchant Name,Charge Amount USD'):
+            with self.subTest(header=header):
+                path = write_csv('\n'.join([header] + rows).encode() + b'\n')
+                self.addCleanup(os.unlink, path)
+                expected = legacy_parse_csv(path)
+                # Amounts are taken unsigned, and an empty description reads as 'nan'
+                self.assertEqual(len(expected), 14)
+                self.assertEqual(CSVParser().parse(path), expected)
+                self.assertEqual([row for batch in CSVParser().parse_batches(path, 5) for row in batch], expected)
+
+
+class PDFParserTests(TestCase):
+    """pdfplumber is the original engine: the other paths must find the same transactions"""
+
+    def sample(self, write, pages):
+        path = write(pages)
+        self.addCleanup(os.unlink, path)
+        return path
+
+    def test_parallel_pages_match_serial(self):
+        path = self.sample(write_sample_pdf, 3)
+        serial = PDFParser(backend='pdfplumber').parse(path)
+        with mock.patch.dict(PDFParser.PARALLEL_MIN_PAGES, {'pdfplumber': 2}), \
+                mock.patch.object(PDFParser, '_extract_pages_parallel', autospec=True,
+                                  side_effect=PDFParser._extract_pages_parallel) as extract_parallel:
+            parallel = PDFParser(workers=2, backend='pdfplumber').parse(path)
+        extract_parallel.assert_called_once()
+        self.assertEqual(len(serial), 120)
+        self.assertEqual(parallel, serial)
+
+    def test_pymupdf_matches_pdfplumber(self):
+        for write, pages in ((write_sample_pdf, 2), (write_sample_table_pdf, 1)):
+            with self.subTest(sample=write.__name__):
+                path = self.sample(write, pages)
+                expected = PDFParser(backend='pdfplumber').parse(path)
+                self.assertTrue(expected)
+                self.assertEqual(PDFParser(backend='pymupdf').parse(path), expected)
+
+    def test_pymupdf_falls_back_to_pdfplumber_on_pages_without_text_matches(self):
+        path = self.sample(write_sample_table_pdf, 2)
+        expected = PDFParser(backend='pdfplumber').parse(path)
+        with mock.patch('fitz.Page.get_text', return_value=''), \
+                mock.patch.object(PDFParser, '_extract_page', autospec=True,
+                                  side_effect=PDFParser._extract_page) as extract_page:
+            self.assertEqual(PDFParser(backend='pymupdf').parse(path), expected)
+        self.assertEqual(extract_page.call_count, 2)
+
+    def test_text_extraction_matches_three_passes(self):
+        parser = PDFParser()
+        text = sample_page_text(2000)
+        self.assertEqual(parser._extract_transactions_from_text(text), legacy_extract_text(parser, text))
+
+
+class DateParserTests(TestCase):
+
+    @staticmethod
+    def legacy(values):
+        results = []
+        for value in values:
+            try:
+                results.append(StatementParser.parse_date(value))
+            except ValueError:
+                results.append(None)
+        return results
+
+    def parse(self, dates, values):
+        results = []
+        for value in values:
+            try:
+                results.append(dates.parse(value))
+            except ValueError:
+                results.append(None)
+        return results
+
+    def test_matches_parse_date(self):
+        values = sample_date_strings(5000) + ['', 'not a date', '31/02/2024', '2024-13-01', '20240230']
+        self.assertEqual(self.parse(DateParser(cache_size=100), values), self.legacy(values))
+
+    def test_learned_format_is_tried_first(self):
+        dates = DateParser()
+        values = ['October 30, 2025', 'November 02, 2025', 'Oct 30, 2025', 'December 9, 2024']
+        self.assertEqual(self.parse(dates, values), self.legacy(values))
+        self.assertEqual(dates.learned, '%B %d, %Y')
+
+    def test_month_first_date_does_not_make_later_dates_month_first(self):
+        dates = DateParser()
+        # '10/ 3/2025' only parses month first, through strptime's space-padded %d
+        values = ['10/30/2025', '03/04/2025', '10/ 3/2025', '03/04/2025', 'Oct 30, 2025', '10-30-2025', '03-04-2025',
+                  '10/30/25', '03/04/25']
+        self.assertEqual(self.parse(dates, values), self.legacy(values))
+        self.assertEqual([str(day) for day in self.parse(dates, values)[2:4]], ['2025-10-03', '2025-04-03'])
+
+
+class CategorizerTests(TestCase):
+
+    def setUp(self):
+        call_command('init_categories', stdout=io.StringIO())
+        category_registry.invalidate()
+        category_cache.clear()
+        self.categorizer = ExpenseCategorizer()
+
+    def assert_matches_legacy(self, descriptions):
+        categorized = self.categorizer.categorize_bulk([{'description': d} for d in descriptions])
+        for description, category in zip(descriptions, categorized):
+            self.assertEqual(category.name, legacy_categorize(self.categorizer, description).name, description)
+
+    def test_noise_does_not_earn_exact_match_bonus(self):
+        self.assertEqual(self.categorizer.categorize('GOLF CLUB 12345').name, 'ENTERTAINMENT')
+        self.assert_matches_legacy(['GOLF CLUB 12345', 'GOLF CLUB', 'FOREVER 21123', 'STORE #ab12 SPOTIFY'])
+
+    def test_bulk_matches_legacy_scoring(self):
+        descriptions = sample_descriptions(3000)
+        descriptions += [
+            f'{description} {i % 12 + 1:02d}/{i % 28 + 1:02d} REF {i}7731' for i, description in enumerate(descriptions[:1000])
+        ]
+        self.assert_matches_legacy(descriptions)
+
+    def test_score_matrix_matches_legacy_including_ties(self):
+        tables = [cat_data['keywords'] for cat_data in self.categorizer.categories.values()]
+        # Bare keywords (exact matches, some shared by two categories) and pairs
+        # of keywords from different categories, which score the same
+        descriptions = [keyword for keywords in tables for keyword in keywords]
+        descriptions += [f'{first[i % len(first)]} {second[i % len(second)]}'
+                         for i, (first, second) in enumerate(zip(tables, tables[1:] + tables[:1])) if first and second]
+        descriptions += [f'{a} {b}' for a, b in zip(descriptions[::7], descriptions[3::11])]
+        descriptions += sample_descriptions(5000)
+
+        scored = self.categorizer.score_texts([d.lower() for d in descriptions])
+        self.assertEqual(
+            [category.name for category in scored],
+            [legacy_categorize(self.categorizer, d).name for d in descriptions]
+        )
+        # Keywords listed under two categories tie on the exact-match bonus
+        shared = [keyword for keyword, count in Counter(descriptions[:sum(map(len, tables))]).items() if count > 1]
+        self.assertTrue(shared)
+
+    @override_settings(CATEGORIZER_WORKERS=2, CATEGORIZER_PARALLEL_MIN_ROWS=100)
+    def test_sharded_scoring_matches_serial(self):
+        self.addCleanup(shutdown_pool)
+        texts = [d.lower() for d in sample_descriptions(1000)]
+        serial = ExpenseCategorizer(workers=1).score_texts(texts)
+        sharded = ExpenseCategorizer()
+        self.assertEqual(sharded.workers, 2)
+
+        # Two shards, both scored in the worker processes
+        with mock.patch.object(ProcessPoolExecutor, 'map', autospec=True,
+                               side_effect=ProcessPoolExecutor.map) as pool_map, \
+                mock.patch.object(ExpenseCategorizer, 'score_names', autospec=True,
+                                  side_effect=ExpenseCategorizer.score_names) as score_names:
+            self.assertEqual(sharded.score_texts(texts), serial)
+        self.assertEqual([len(shard) for shard in pool_map.call_args.args[2]], [500, 500])
+        score_names.assert_not_called()
+
+        # A pool restarted under it falls back to scoring here
+        with mock.patch('expenses.categorizer._shard_pool', side_effect=RuntimeError('cannot schedule new futures')), \
+                mock.patch.object(ExpenseCategorizer, 'score_names', autospec=True,
+                                  side_effect=ExpenseCategorizer.score_names) as score_names:
+            self.assertEqual(sharded.score_texts(texts), serial)
+        score_names.assert_called_once()
+
+    @override_settings(CATEGORY_REGISTRY_CHECK_INTERVAL=0)
+    def test_category_change_in_another_process_reaches_this_one(self):
+        self.assertEqual(self.categorizer.categorize('ZZQX').name, 'UNCATEGORIZED')
+        version = category_registry.version
+        # update() sends no signal: only the other process's invalidation tells this one
+        Category.objects.filter(name='TRAVEL').update(keywords=['zzqx'])
+        CategoryRegistry().invalidate()
+
+        self.assertNotEqual(category_registry.version, version)
+        self.assertEqual(ExpenseCategorizer().categorize('ZZQX').name, 'TRAVEL')
+
+    def test_descriptions_differing_in_noise_share_a_key(self):
+        keys = {self.categorizer.description_key(f'UBER TRIP 03/{day:02d} 4411{day}') for day in range(1, 29)}
+        self.assertEqual(len(keys), 1)
+
+
+class IngestionTests(TestCase):
+
+    def setUp(self):
+        call_command('init_categories', stdout=io.StringIO())
+        category_registry.invalidate()
+        self.user = User.objects.create_user(email='ingest@example.com', username='ingest', password='x')
+        rows = [b'2024-03-%02d,GROCERY STORE %d,%d.25' % (i % 28 + 1, i, i + 1) for i in range(20)]
+        self.statement = Statement.objects.create(
+            user=self.user, file_name='march.csv', file_type='CSV',
+            file_path=write_csv(b'Date,Description,Amount\n' + b'\n'.join(rows) + b'\n')
+        )
+        self.addCleanup(ingestion._unlink, self.statement.file_path)
+
+    def test_stale_claim_is_queued_again_and_processed(self):
+        abandoned = ingestion.claim(self.statement.pk)
+        self.assertEqual(ingestion.reset_stale(), 0)
+        long_ago = timezone.now() - timedelta(hours=1)
+        Statement.objects.filter(pk=abandoned.pk).update(started_at=long_ago, heartbeat_at=long_ago)
+        abandoned.started_at = long_ago
+
+        self.assertEqual(ingestion.reset_stale(), 1)
+        self.statement.refresh_from_db()
+        self.assertEqual(self.statement.status, 'PENDING')
+
+        # The old worker finds its claim gone and leaves file and rows alone
+        ingestion.process_statement(statement=abandoned)
+        self.assertTrue(os.path.exists(self.statement.file_path))
+        self.assertFalse(self.statement.transactions.exists())
+
+        statement = ingestion.process_statement(self.statement.pk)
+        self.assertEqual(statement.status, 'COMPLETED')
+        self.assertEqual(statement.transactions.count(), 20)
+        self.assertFalse(os.path.exists(statement.file_path))
+
+    def test_deleting_a_queued_statement_removes_its_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.statement.delete()
+        self.assertFalse(os.path.exists(self.statement.file_path))
+
+    def process(self, name, rows):
+        """Ingest CSV rows (date, description, amount) as a new statement of the user"""
+        lines = [f'{date},{description},{amount}'.encode() for date, description, amount in rows]
+        statement = Statement.objects.create(
+            user=self.user, file_name=name, file_type='CSV',
+            file_path=write_csv(b'Date,Description,Amount\n' + b'\n'.join(lines) + b'\n')
+        )
+        self.addCleanup(ingestion._unlink, statement.file_path)
+        return ingestion.process_statement(statement.pk)
+
+    def test_overlapping_statement_skips_rows_already_stored(self):
+        days = [(f'2024-04-{day:02d}', f'BAKERY {day}', f'{day}.10') for day in range(1, 8)]
+        self.process('first.csv', days[:5])
+        # Case and spacing of the description do not make a row new
+        overlap = [(date, description.lower().replace(' ', '  '), amount) for date, description, amount in days[2:5]]
+        second = self.process('second.csv', overlap + days[5:])
+
+        self.assertEqual((second.rows_inserted, second.rows_duplicate), (2, 3))
+        self.assertEqual(second.transactions.count(), 2)
+        self.assertEqual(self.user.transactions.count(), 7)
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.user)
+        status = client.get(f'/api/statements/{second.pk}/status/').data
+        self.assertEqual(
+            (status['status'], status['rows_parsed'], status['rows_inserted'], status['rows_duplicate']),
+            ('COMPLETED', 5, 2, 3)
+        )
+
+    def test_repeated_row_keeps_copies_beyond_those_stored(self):
+        coffee = ('2024-05-02', 'COFFEE CART', '3.50')
+        self.process('first.csv', [coffee, coffee, ('2024-05-03', 'NEWSSTAND', '2.00')])
+        second = self.process('second.csv', [coffee, coffee, coffee])
+
+        self.assertEqual((second.rows_inserted, second.rows_duplicate), (1, 2))
+        self.assertEqual(self.user.transactions.filter(description='COFFEE CART').count(), 3)
+
+    def test_rebuild_rollups_reports_and_fixes_drift(self):
+        ingestion.process_statement(self.statement.pk)
+        call_command('rebuild_rollups', '--check', stdout=io.StringIO())
+
+        rollup = SpendingRollup.objects.filter(statement=self.statement).first()
+        SpendingRollup.objects.filter(pk=rollup.pk).update(count=rollup.count + 1)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', '--check', stdout=io.StringIO())
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        call_command('rebuild_rollups', '--check', stdout=io.StringIO())
+
+    def test_deleting_categories_merges_their_rollups(self):
+        statement = self.process('june.csv', [
+            ('2024-06-03', 'STARBUCKS', '4.50'), ('2024-06-03', 'UBER TRIP', '12.00'), ('2024-06-10', 'STARBUCKS', '3.00'),
+        ])
+        self.assertEqual(statement.rollups.count(), 2)
+        # Both categories share the statement's (account, month, weekday) key
+        Category.objects.get(name='FOOD').delete()
+        Category.objects.get(name='TRANSPORT').delete()
+
+        self.assertEqual(
+            list(statement.rollups.values_list('category_id', 'total', 'count')), [(None, Decimal('19.50'), 3)]
+        )
+        call_command('rebuild_rollups', '--check', stdout=io.StringIO())
+
+        # A duplicate stored before the merge existed is drift too
+        rollup = statement.rollups.get()
+        SpendingRollup.objects.create(user=self.user, statement=statement, month=rollup.month, weekday=rollup.weekday)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', '--check', stdout=io.StringIO())
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(statement.rollups.count(), 1)
+
+    def test_deleting_categories_moves_their_summary_counts(self):
+        statement = self.process('june.csv', [
+            ('2024-06-03', 'STARBUCKS', '4.50'), ('2024-06-04', 'UBER TRIP', '12.00'), ('2024-06-10', 'STARBUCKS', '3.00'),
+        ])
+        # The first deletion leaves uncategorized rows, the second adds to them
+        Category.objects.get(name='TRANSPORT').delete()
+        Category.objects.get(name='FOOD').delete()
+
+        self.assertEqual(statement.summary.category_counts, {'': 3})
+        self.assertEqual(SpendingSummary.objects.get(user=self.user, statement=None).category_counts[''], 3)
+        call_command('rebuild_summaries', '--check', stdout=io.StringIO())
+        with override_settings(DASHBOARD_USE_ROLLUPS=False):
+            raw = Dashboard(self.user, statement.pk).summary()
+        self.assertEqual(Dashboard(self.user, statement.pk).summary(), raw)
+        self.assertEqual(raw['category_count'], 1)
+
+    def test_rebuild_summaries_reports_and_fixes_drift(self):
+        ingestion.process_statement(self.statement.pk)
+        call_command('rebuild_summaries', '--check', stdout=io.StringIO())
+
+        summary = SpendingSummary.objects.get(statement=self.statement)
+        SpendingSummary.objects.filter(pk=summary.pk).update(category_counts={'': summary.count})
+        SpendingSummary.objects.filter(user=self.user, statement=None).update(total=summary.total + 1)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_summaries', '--check', stdout=io.StringIO())
+        call_command('rebuild_summaries', stdout=io.StringIO())
+        call_command('rebuild_summaries', '--check', stdout=io.StringIO())
+        self.assertEqual(SpendingSummary.objects.get(statement=self.statement).category_counts, summary.category_counts)
+
+    def test_deleting_a_statement_narrows_the_user_summary_dates(self):
+        march = ingestion.process_statement(self.statement.pk)
+        wider = self.process('wider.csv', [('2024-02-10', 'BAKERY', '3.10'), ('2024-05-20', 'BAKERY', '4.10')])
+        user_summary = SpendingSummary.objects.get(user=self.user, statement=None)
+        self.assertEqual((str(user_summary.first_date), str(user_summary.last_date)), ('2024-02-10', '2024-05-20'))
+
+        wider.delete()
+        user_summary.refresh_from_db()
+        self.assertEqual((str(user_summary.first_date), str(user_summary.last_date)), ('2024-03-01', '2024-03-20'))
+        self.assertEqual((user_summary.count, user_summary.total), (20, march.summary.total))
+        call_command('rebuild_summaries', '--check', stdout=io.StringIO())
+
+    def test_parse_cache_key_depends_on_pdf_backend(self):
+        self.assertNotEqual(
+            ingestion._parse_cache_key(self.statement, PDFParser(backend='pymupdf')),
+            ingestion._parse_cache_key(self.statement, PDFParser(backend='pdfplumber'))
+        )
+
+
+class MerchantRuleTests(TestCase):
+
+    def setUp(self):
+        call_command('init_categories', stdout=io.StringIO())
+        category_registry.invalidate()
+        category_cache.clear()
+        self.alice = User.objects.create_user(email='alice@example.com', username='alice', password='x')
+        self.bob = User.objects.create_user(email='bob@example.com', username='bob', password='x')
+        self.staff = User.objects.create_user(email='staff@example.com', username='staff', password='x', is_staff=True)
+        self.ingest(self.alice, b'2024-04-01,BOOKSHOP 1001,12.00\n2024-04-09,BOOKSHOP 1002,30.00\n2024-04-10,BUS FARE,2.50\n')
+        self.ingest(self.bob, b'2024-04-03,BOOKSHOP 2001,7.00\n')
+        self.key = normalize_description('BOOKSHOP 1001')
+        self.travel = Category.objects.get(name='TRAVEL')
+        self.luxury = Category.objects.get(name='LUXURY')
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def ingest(self, user, rows):
+        statement = Statement.objects.create(user=user, file_name='april.csv', file_type='CSV',
+            file_path=write_csv(b'Date,Description,Amount\n' + rows))
+        self.addCleanup(ingestion._unlink, statement.file_path)
+        ingestion.process_statement(statement.pk)
+
+    def create_rule(self, user, category, **extra):
+        self.client.force_authenticate(user)
+        return self.client.post(reverse('merchant-rule-list'),
+                                {'description': 'Bookshop 9999', 'category': category.pk, **extra}, format='json')
+
+    def test_user_rule_beats_global_rule(self):
+        global_rule = MerchantRule.objects.create(merchant_key=self.key, category=self.travel)
+        user_rule = MerchantRule.objects.create(user=self.alice, merchant_key=self.key, category=self.luxury)
+
+        self.assertEqual(ExpenseCategorizer(user_id=self.alice.pk).rules[self.key], self.luxury)
+        self.assertEqual(ExpenseCategorizer(user_id=self.bob.pk).rules[self.key], self.travel)
+        self.assertEqual(ExpenseCategorizer().rules[self.key], self.travel)
+        self.assertEqual({t.user_id for t in merchant_rules.matching_transactions(global_rule)}, {self.bob.pk})
+        self.assertEqual({t.user_id for t in merchant_rules.matching_transactions(user_rule)}, {self.alice.pk})
+
+    def test_only_staff_create_global_rules(self):
+        response = self.create_rule(self.alice, self.travel, is_global=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('is_global', response.data)
+        self.assertFalse(MerchantRule.objects.exists())
+
+        response = self.create_rule(self.staff, self.travel, is_global=True)
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(MerchantRule.objects.get().user_id)
+
+    def test_create_refiles_stored_transactions_without_drift(self):
+        response = self.create_rule(self.alice, self.luxury)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['merchant_key'], self.key)
+        self.assertEqual(response.data['transactions_updated'], 2)
+        self.assertEqual(self.create_rule(self.alice, self.luxury).data['transactions_updated'], 0)
+
+        # The global rule leaves alice's transactions to her own rule
+        self.assertEqual(self.create_rule(self.staff, self.travel, is_global=True).data['transactions_updated'], 1)
+        categories = dict(Transaction.objects.filter(merchant_key=self.key).values_list('user_id', 'category__name'))
+        self.assertEqual(categories, {self.alice.pk: 'LUXURY', self.bob.pk: 'TRAVEL'})
+
+        call_command('rebuild_rollups', '--check', stdout=io.StringIO())
+        call_command('rebuild_summaries', '--check', stdout=io.StringIO())
+
+
+class RecategorizationTests(TestCase):
+
+    # Unknown to the keyword tables until a test adds 'zzqx' to TRAVEL
+    DESCRIPTIONS = ['ZZQX WQRT', 'PLOV KIOSK', 'ZZQX VBNM', 'ZZQX WQRT', 'ZZQX QPLM']
+
+    def setUp(self):
+        call_command('init_categories', stdout=io.StringIO())
+        category_registry.invalidate()
+        category_cache.clear()
+        self.user = User.objects.create_user(email='recat@example.com', username='recat', password='x')
+        rows = [
+            f'2024-07-{i + 1:02d},{self.DESCRIPTIONS[i % len(self.DESCRIPTIONS)]},{i + 1}.40'.encode()
+            for i in range(20)
+        ]
+        statement = Statement.objects.create(
+            user=self.user, file_name='july.csv', file_type='CSV',
+            file_path=write_csv(b'Date,Description,Amount\n' + b'\n'.join(rows) + b'\n')
+        )
+        self.addCleanup(ingestion._unlink, statement.file_path)
+        ingestion.process_statement(statement.pk)
+        self.zzqx = self.user.transactions.filter(description__startswith='ZZQX')
+        self.assertEqual(set(self.zzqx.values_list('category__name', flat=True)), {'UNCATEGORIZED'})
+        Category.objects.filter(name='TRAVEL').update(keywords=['zzqx'])
+
+    def recategorize(self, *args):
+        out = io.StringIO()
+        call_command('recategorize', '--batch-size', '5', *args, stdout=out)
+        return out.getvalue()
+
+    def assert_refiled_without_drift(self):
+        self.assertEqual(set(self.zzqx.values_list('category__name', flat=True)), {'TRAVEL'})
+        self.assertEqual(self.user.transactions.get(description='PLOV KIOSK', date='2024-07-02').category.name,
+                         'UNCATEGORIZED')
+        call_command('rebuild_rollups', '--check', stdout=io.StringIO())
+        call_command('rebuild_summaries', '--check', stdout=io.StringIO())
+
+    def test_keyword_change_refiles_stored_transactions(self):
+        self.recategorize()
+        job = RecategorizationJob.objects.get()
+        self.assertEqual((job.status, job.rows_scanned, job.rows_changed), ('COMPLETED', 20, 16))
+        self.assert_refiled_without_drift()
+
+    def test_each_distinct_description_is_categorized_once(self):
+        with mock.patch.object(ExpenseCategorizer, 'categorize_bulk', autospec=True,
+                               side_effect=ExpenseCategorizer.categorize_bulk) as categorize_bulk:
+            self.recategorize()
+        categorized = Counter(row['description'] for call in categorize_bulk.call_args_list for row in call.args[1])
+        self.assertEqual(categorized, Counter(set(self.DESCRIPTIONS)))
+
+    def test_failed_job_resumes_after_its_last_batch(self):
+        move_transactions = rollups.move_transactions
+        calls = []
+
+        def fail_second_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('disk full')
+            move_transactions(*args)
+
+        with mock.patch('expenses.rollups.move_transactions', side_effect=fail_second_batch):
+            self.recategorize()
+        job = RecategorizationJob.objects.get()
+        first_batch = list(self.user.transactions.order_by('pk').values_list('pk', flat=True)[:5])
+        self.assertEqual((job.status, job.error, job.last_id, job.rows_scanned), ('FAILED', 'disk full', first_batch[-1], 5))
+        # The failed batch rolled back; the first one stayed
+        self.assertEqual(self.zzqx.filter(category__name='TRAVEL').count(), 4)
+        call_command('rebuild_rollups', '--check', stdout=io.StringIO())
+        call_command('rebuild_summaries', '--check', stdout=io.StringIO())
+
+        self.assertIn(f'after transaction {first_batch[-1]}', self.recategorize('--resume'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error, job.rows_scanned, job.rows_changed), ('COMPLETED', '', 20, 16))
+        self.assert_refiled_without_drift()
+
+    def test_running_job_is_not_run_twice(self):
+        job = RecategorizationJob.objects.create(user=self.user)
+        other = RecategorizationJob.objects.get(pk=job.pk)
+        self.assertTrue(other.claim())
+        self.assertIsNone(recategorization.run(job))
+
+        with self.assertRaises(CommandError):
+            self.recategorize('--resume', str(job.pk))
+        with self.assertRaises(CommandError):
+            self.recategorize('--resume')
+        self.assertEqual(set(self.zzqx.values_list('category__name', flat=True)), {'UNCATEGORIZED'})
+
+    def test_abandoned_running_job_resumes_after_its_last_batch(self):
+        def die_after_first_batch(job):
+            # A killed process: nothing gets to mark the job FAILED
+            raise SystemExit(1)
+
+        job = RecategorizationJob.objects.create(user=self.user)
+        with self.assertRaises(SystemExit):
+            recategorization.run(job, batch_size=5, progress=die_after_first_batch)
+        first_batch = list(self.user.transactions.order_by('pk').values_list('pk', flat=True)[:5])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_id, job.rows_scanned), ('RUNNING', first_batch[-1], 5))
+
+        # Still within its heartbeat, the job belongs to the runner that claimed it
+        with self.assertRaises(CommandError):
+            self.recategorize('--resume')
+
+        stale = job.heartbeat_at - timedelta(seconds=settings.RECATEGORIZATION_STALE_AFTER + 1)
+        RecategorizationJob.objects.filter(pk=job.pk).update(heartbeat_at=stale)
+        abandoned = RecategorizationJob.objects.get(pk=job.pk)
+        self.assertIn(f'after transaction {first_batch[-1]}', self.recategorize('--resume'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_scanned, job.rows_changed), ('COMPLETED', 20, 16))
+        self.assert_refiled_without_drift()
+
+        # The abandoned runner finds its claim gone if it ever reports back
+        with self.assertRaises(recategorization.ClaimLost):
+            recategorization._save(abandoned, last_id=0)
+
+
+@override_settings(STATEMENT_INGESTION_WORKERS=0)
+class StatementUploadTests(TestCase):
+
+    def setUp(self):
+        call_command('init_categories', stdout=io.StringIO())
+        category_registry.invalidate()
+        self.user = User.objects.create_user(email='upload@example.com', username='upload', password='x')
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+        upload_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(upload_dir.cleanup)
+        self.enterContext(override_settings(STATEMENT_UPLOAD_DIR=upload_dir.name))
+
+    def upload(self):
+        content = b'Date,Description,Amount\n2024-03-01,BOOKSHOP,12.50\n2024-03-02,BAKERY,4.20\n'
+        return self.client.post('/api/statements/upload/', {'file': SimpleUploadedFile('march.csv', content)})
+
+    def test_same_file_again_points_at_completed_statement(self):
+        first = self.upload()
+        self.assertEqual(first.data['status'], 'COMPLETED')
+        again = self.upload()
+        self.assertTrue(again.data['duplicate'])
+        self.assertEqual(again.data['statement_id'], first.data['statement_id'])
+
+    def test_same_file_again_skips_abandoned_statement(self):
+        first = self.upload()
+        long_ago = timezone.now() - timedelta(hours=1)
+        Statement.objects.filter(pk=first.data['statement_id']).update(
+            status='INSERTING', started_at=long_ago, heartbeat_at=long_ago
+        )
+        again = self.upload()
+        self.assertFalse(again.data['duplicate'])
+        self.assertNotEqual(again.data['statement_id'], first.data['statement_id'])
+
+
+class TransactionListTests(TestCase):
+
+    def setUp(self):
+        call_command('init_categories', stdout=io.StringIO())
+        category_registry.invalidate()
+        self.user = User.objects.create_user(email='lister@example.com', username='lister', password='x')
+        self.other = User.objects.create_user(email='other@example.com', username='other', password='x')
+        self.may = Statement.objects.create(user=self.user, file_name='may.csv', file_type='CSV')
+        self.april = Statement.objects.create(user=self.user, file_name='april.csv', file_type='CSV')
+        food, transport = Category.objects.get(name='FOOD'), Category.objects.get(name='TRANSPORT')
+        for statement, date, description, amount, currency, category in [
+            (self.april, '2024-04-30', 'BAKERY', '3.10', 'USD', food),
+            (self.may, '2024-05-01', 'BOOKSHOP, "CORNER"', '12.00', 'USD', None),
+            (self.may, '2024-05-01', 'ЯНДЕКС ТАКСИ', '300.00', 'RUB', transport),
+            (self.may, '2024-05-02', 'CAFÉ MÜNCHEN', '4.50', 'EUR', food),
+            (self.may, '2024-05-02', 'LINE\u2028SEPARATOR', '1.00', 'USD', None),
+            (self.may, '2024-05-02', 'BUS FARE', '2.75', 'USD', transport),
+        ]:
+            Transaction.objects.create(user=self.user, statement=statement, date=date, description=description,
+                                       amount=Decimal(amount), currency=currency, category=category)
+        other_statement = Statement.objects.create(user=self.other, file_name='may.csv', file_type='CSV')
+        Transaction.objects.create(user=self.other, statement=other_statement, date='2024-05-02',
+                                   description='SOMEONE ELSE', amount=Decimal('9.99'), category=food)
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def newest_first(self):
+        return Transaction.objects.filter(user=self.user).select_related('category').order_by('-date', '-id')
+
+    def test_list_renders_the_same_bytes_as_the_model_serializer(self):
+        response = self.client.get(reverse('transaction-list'))
+        self.assertEqual(response.status_code, 200)
+        expected = JSONRenderer().render(TransactionSerializer(self.newest_first(), many=True).data)
+        self.assertIn(b'\\u2028', expected)
+        self.assertTrue(response.content.endswith(b'"results":' + expected + b'}'), response.content)
+
+    def test_list_and_detail_match_the_original_field_definitions(self):
+        class OriginalTransactionSerializer(serializers.ModelSerializer):
+            category_name = serializers.CharField(source='category.get_name_display', read_only=True)
+            category_id = serializers.IntegerField(source='category.id', read_only=True)
+
+            class Meta:
+                model = Transaction
+                fields = ('id', 'date', 'description', 'amount', 'currency', 'category_id',
+                          'category_name', 'created_at')
+
+        transactions = list(self.newest_first())
+        expected = JSONRenderer().render(OriginalTransactionSerializer(transactions, many=True).data)
+        # Uncategorized rows have no category keys at all
+        self.assertNotIn(b'null', expected)
+        response = self.client.get(reverse('transaction-list'))
+        self.assertTrue(response.content.endswith(b'"results":' + expected + b'}'), response.content)
+        for transaction in transactions:
+            response = self.client.get(reverse('transaction-detail', args=[transaction.pk]))
+            self.assertEqual(response.content, JSONRenderer().render(OriginalTransactionSerializer(transaction).data))
+
+        response = self.client.get(reverse('transaction-list') + '?fields=id,category_name')
+        self.assertEqual(response.data['results'], [
+            {'id': t.pk, 'category_name': t.category.get_name_display()} if t.category else {'id': t.pk}
+            for t in transactions
+        ])
+
+    def test_pages_follow_on_across_a_day_boundary(self):
+        pages = []
+        url = reverse('transaction-list') + '?page_size=2'
+        while url:
+            response = self.client.get(url)
+            pages.append([(item['date'], item['id']) for item in response.data['results']])
+            url = response.data['next']
+        # The second page ends one day and starts the next
+        self.assertEqual([[date for date, _ in page] for page in pages], [
+            ['2024-05-02', '2024-05-02'], ['2024-05-02', '2024-05-01'], ['2024-05-01', '2024-04-30'],
+        ])
+        self.assertEqual([pk for page in pages for _, pk in page], [t.pk for t in self.newest_first()])
+
+    def test_pages_through_a_day_longer_than_the_offset_cutoff(self):
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, statement=self.may, date='2024-05-03', description=f'METER {i}',
+                        amount=Decimal('1.00'), category=None)
+            for i in range(1203)
+        ])
+        expected = [t.pk for t in self.newest_first()]
+        seen, previous = [], None
+        url = reverse('transaction-list') + '?page_size=400&fields=id'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.append([item['id'] for item in response.data['results']])
+            url, previous = response.data['next'], response.data['previous']
+        self.assertEqual([len(page) for page in seen], [400, 400, 400, 9])
+        self.assertEqual([pk for page in seen for pk in page], expected)
+
+        # previous walks back to the page before, on the same day
+        back = self.client.get(previous).data
+        self.assertEqual([item['id'] for item in back['results']], seen[2])
+        self.assertEqual(self.client.get(back['previous']).data['results'], [{'id': pk} for pk in seen[1]])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse('transaction-list'), {'cursor': 'bm90IGEgY3Vyc29y'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_fields_keeps_only_the_listed_fields(self):
+        response = self.client.get(reverse('transaction-list'), {'fields': 'id, amount,unknown'})
+        self.assertEqual(response.data['results'], [{'id': t.pk, 'amount': str(t.amount)} for t in self.newest_first()])
+
+    def export(self, export_format, **filters):
+        response = self.client.get(reverse('transaction-export'), {'format': export_format, **filters})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def ndjson(self, **filters):
+        return [json.loads(line) for line in self.export('ndjson', **filters).split('\n') if line]
+
+    def test_csv_export(self):
+        content = self.export('csv')
+        bookshop = self.newest_first().get(description__startswith='BOOKSHOP')
+        self.assertTrue(content.startswith('id,date,description,amount,currency,category\r\n'))
+        self.assertIn(f'\r\n{bookshop.pk},2024-05-01,"BOOKSHOP, ""CORNER""",12.00,USD,\r\n', content)
+        rows = list(csv.reader(io.StringIO(content, newline='')))
+        self.assertEqual([int(row[0]) for row in rows[1:]], [t.pk for t in self.newest_first()])
+
+    def test_ndjson_export(self):
+        rows = self.ndjson()
+        bus_fare = self.newest_first().first()
+        self.assertEqual(rows[0], {
+            'id': bus_fare.pk, 'date': '2024-05-02', 'description': 'BUS FARE', 'amount': '2.75',
+            'currency': 'USD', 'category': category_registry.display_name('TRANSPORT'),
+        })
+        self.assertEqual([row['id'] for row in rows], [t.pk for t in self.newest_first()])
+        self.assertIn('ЯНДЕКС ТАКСИ', [row['description'] for row in rows])
+        self.assertNotIn('SOMEONE ELSE', [row['description'] for row in rows])
+
+    def test_export_honours_the_list_filters(self):
+        def exported(**filters):
+            return [row['description'] for row in self.ndjson(**filters)]
+
+        self.assertEqual(exported(statement_id=self.april.pk), ['BAKERY'])
+        transport = Category.objects.get(name='TRANSPORT')
+        self.assertEqual(exported(category_id=transport.pk), ['BUS FARE', 'ЯНДЕКС ТАКСИ'])
+        self.assertEqual(exported(start_date='2024-05-01', end_date='2024-05-01'),
+                         ['ЯНДЕКС ТАКСИ', 'BOOKSHOP, "CORNER"'])
+        self.assertEqual(exported(start_date='2024-06-01'), [])
+
+
+# Merchants of several categories, cycled over three months of spending
+DASHBOARD_MERCHANTS = [
+    ('WHOLE FOODS MARKET', '54.20'), ('UBER TRIP', '18.75'), ('NETFLIX', '15.99'),
+    ('SHELL OIL', '42.10'), ('STARBUCKS', '6.45'), ('CVS PHARMACY', '23.80'),
+]
+
+
+class DashboardQueryTests(TestCase):
+    """Queries each dashboard endpoint runs with a warm category registry, per filter"""
+
+    # URL name -> queries without filters, by statement, by whole months, by a
+    # partial month (the summary row only covers undated requests)
+    QUERIES = {
+        'dashboard_summary': (1, 1, 2, 2),
+        'category_breakdown': (1, 1, 1, 1),
+        'top_categories': (1, 1, 1, 1),
+        'spending_trend': (1, 1, 1, 1),
+        'spending_by_weekday': (1, 1, 1, 1),
+        'ai_recommendations': (1, 1, 1, 1),
+        'dashboard': (3, 3, 4, 4),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_categories', stdout=io.StringIO())
+        category_registry.invalidate()
+        cls.user = User.objects.create_user(email='dash@example.com', username='dash', password='x')
+        rows = [
+            ('2024-%02d-%02d,%s,%s' % (i % 3 + 1, i % 28 + 1, *DASHBOARD_MERCHANTS[i % len(DASHBOARD_MERCHANTS)])).encode()
+            for i in range(90)
+        ]
+        statement = Statement.objects.create(
+            user=cls.user, file_name='q1.csv', file_type='CSV',
+            file_path=write_csv(b'Date,Description,Amount\n' + b'\n'.join(rows) + b'\n')
+        )
+        ingestion.process_statement(statement.pk)
+        cls.filters = (
+            {},
+            {'statement_id': statement.pk},
+            {'start_date': '2024-01-01', 'end_date': '2024-02-29'},
+            {'start_date': '2024-01-10', 'end_date': '2024-02-20'},
+        )
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+        category_registry.invalidate()
+        category_registry.all()
+
+    def test_fixture_spans_several_categories(self):
+        self.assertGreaterEqual(self.user.transactions.values('category').distinct().count(), 5)
+
+    def test_rollups_match_raw_transactions(self):
+        statement_id = self.filters[1]['statement_id']
+        filters = self.filters + ({'statement_id': statement_id, 'start_date': '2024-02-01', 'end_date': '2024-03-31'},)
+        for params in filters:
+            with self.subTest(params=params):
+                with override_settings(DASHBOARD_USE_ROLLUPS=False):
+                    raw = Dashboard(self.user, **params).as_dict()
+                with override_settings(DASHBOARD_USE_ROLLUPS=True):
+                    dashboard = Dashboard(self.user, **params)
+                    # Only the part-month filter reads raw transactions
+                    self.assertEqual(dashboard.source.from_rollups, params is not self.filters[3])
+                    self.assertEqual(dashboard.as_dict(), raw)
+                self.assertGreater(raw['summary']['transaction_count'], 0)
+
+    def test_combined_dashboard_matches_single_panel_endpoints(self):
+        endpoints = {
+            'summary': 'dashboard_summary', 'top_categories': 'top_categories', 'spending_trend': 'spending_trend',
+            'spending_by_weekday': 'spending_by_weekday', 'category_breakdown': 'category_breakdown',
+            'recommendations': 'ai_recommendations',
+        }
+        self.assertEqual(set(endpoints), set(Dashboard.PANELS))
+        for params in self.filters:
+            with self.subTest(params=params):
+                combined = self.client.get(reverse('dashboard'), params).json()
+                self.assertEqual(combined, {
+                    panel: self.client.get(reverse(name), params).json() for panel, name in endpoints.items()
+                })
+
+    def test_dated_summary_uses_most_common_currency(self):
+        # The raw path used to take the latest transaction's currency
+        dated = self.filters[3]
+        in_range = self.user.transactions.filter(date__gte=dated['start_date'], date__lte=dated['end_date'])
+        Transaction.objects.filter(date=in_range.order_by('-date').first().date).update(currency='EUR')
+        dashboard_cache.bump_user_version(self.user.pk)
+        response = self.client.get(reverse('dashboard_summary'), dated)
+        self.assertEqual(response.data['currency'], 'USD')
+
+    def test_query_counts(self):
+        for name, counts in self.QUERIES.items():
+            for params, expected in zip(self.filters, counts):
+                with self.subTest(endpoint=name, params=params):
+                    dashboard_cache.bump_user_version(self.user.pk)
+                    with self.assertNumQueries(expected):
+                        response = self.client.get(reverse(name), params)
+                    self.assertEqual(response.status_code, 200)
+
+
+class DashboardCacheTests(TestCase):
+
+    def setUp(self):
+        call_command('init_categories', stdout=io.StringIO())
+        category_registry.invalidate()
+        self.user = User.objects.create_user(email='cached@example.com', username='cached', password='x')
+        self.other = User.objects.create_user(email='other@example.com', username='other', password='x')
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def statement(self, user, day):
+        statement = Statement.objects.create(
+            user=user, file_name=f'{day}.csv', file_type='CSV',
+            file_path=write_csv(f'Date,Description,Amount\n2024-06-{day:02d},BOOKSHOP,{day}.00\n'.encode())
+        )
+        self.addCleanup(ingestion._unlink, statement.file_path)
+        return statement
+
+    def etag(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('dashboard_summary'))
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_matching_etag_is_not_modified(self):
+        ingestion.process_statement(self.statement(self.user, 1).pk)
+        etag = self.etag(self.user)
+        response = self.client.get(reverse('dashboard_summary'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(reverse('dashboard_summary'), HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_processing_and_deleting_a_statement_bump_only_its_user(self):
+        ingestion.process_statement(self.statement(self.other, 1).pk)
+        statement = self.statement(self.user, 2)
+        before, other = self.etag(self.user), self.etag(self.other)
+
+        ingestion.process_statement(statement.pk)
+        processed = self.etag(self.user)
+        self.assertNotEqual(processed, before)
+        self.assertEqual(self.etag(self.other), other)
+
+        statement.delete()
+        self.assertNotIn(self.etag(self.user), (before, processed))
+        self.assertEqual(self.etag(self.other), other)
+
+
+class RecommendationsTests(TestCase):
+
+    def setUp(self):
+        call_command('init_categories', stdout=io.StringIO())
+        category_registry.invalidate()
+        self.user = User.objects.create_user(email='recs@example.com', username='recs', password='x')
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def test_weekday_weekend_and_income_in_one_query(self):
+        today = timezone.now().date()
+        saturday = today - timedelta(days=(today.weekday() - 5) % 7)
+        sunday, monday = saturday - timedelta(days=6), saturday - timedelta(days=5)
+        food, income = Category.objects.get(name='FOOD'), Category.objects.get(name='INCOME')
+        statement = Statement.objects.create(user=self.user, file_name='week.csv', file_type='CSV', status='COMPLETED')
+        for date, category, amount in [
+            (monday, food, '60.00'), (saturday, food, '100.00'), (sunday, food, '40.00'), (monday, income, '1000.00')
+        ]:
+            Transaction.objects.create(
+                user=self.user, statement=statement, category=category, date=date,
+                description=category.name, amount=Decimal(amount)
+            )
+
+        category_registry.all()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('ai_recommendations'))
+
+        # 200.00 spent (income left out) over 4 transactions and 7 days, 140.00 of it on the weekend
+        self.assertEqual(response.json(), {
+            'potential_savings': 20.0,
+            'budget_optimization': [{
+                'category': 'Food & Dining',
+                'suggestion': 'Accounts for 100.0% of spending. Consider setting a budget limit.'
+            }],
+            'spending_pattern': (
+                'You made 4 transactions over 7 days, averaging $28.57/day. '
+                'Your average transaction is $50.00. '
+                'Weekend spending is 70.0% of total - consider meal planning and entertainment budgets. '
+                'Top focus areas: Food & Dining.'
+            ),
+            'total_transactions': 4,
+            'average_transaction': 50.0,
+        })
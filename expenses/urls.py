@@ -7,6 +7,7 @@ router.register(r'statements', views.StatementViewSet, basename='statement')
 router.register(r'transactions', views.TransactionViewSet, basename='transaction')
 router.register(r'categories', views.CategoryViewSet, basename='category')
 router.register(r'accounts', views.AccountViewSet, basename='account')  # ← Add this
+router.register(r'merchant-rules', views.MerchantRuleViewSet, basename='merchant-rule')
 
 urlpatterns = [
     # Authentication
@@ -17,12 +18,19 @@ urlpatterns = [
     path('auth/password-reset-confirm/', views.password_reset_confirm, name='password_reset_confirm'),
     
     # Dashboard & Analytics
+    path('dashboard/', views.dashboard, name='dashboard'),
     path('dashboard/summary/', views.dashboard_summary, name='dashboard_summary'),
     path('dashboard/category-breakdown/', views.category_breakdown, name='category_breakdown'),
     path('dashboard/top-categories/', views.top_categories, name='top_categories'),
     path('dashboard/spending-trend/', views.spending_trend, name='spending_trend'),
     path('dashboard/spending-by-weekday/', views.spending_by_weekday, name='spending_by_weekday'),
     path('dashboard/recommendations/', views.ai_recommendations, name='ai_recommendations'),
+    path('dashboard/cache-stats/', views.dashboard_cache_stats, name='dashboard_cache_stats'),
+    
+    # Maintenance (staff only)
+    path('categorizer/cache-stats/', views.categorizer_cache_stats, name='categorizer_cache_stats'),
+    path('recategorize/', views.recategorize, name='recategorize'),
+    path('recategorize/<int:pk>/', views.recategorize_status, name='recategorize_status'),
     
     # Router URLs
     path('', include(router.urls)),
@@ -253,6 +253,7 @@ const UploadStatement = ({ onClose, onUploadSuccess }) => {
   const [file, setFile] = useState(null);
   const [currency, setCurrency] = useState('USD');
   const [uploading, setUploading] = useState(false);
+  const [progress, setProgress] = useState(null);
   const [error, setError] = useState('');
 
   const handleFileChange = (e) => {
@@ -283,13 +284,46 @@ const UploadStatement = ({ onClose, onUploadSuccess }) => {
 
     try {
       const response = await statementAPI.upload(formData);
-      alert(response.data.message);
-      onUploadSuccess(response.data.statement_id);
+      const statementId = response.data.statement_id;
+
+      // Upload returns 202 straight away; poll until the worker finishes,
+      // backing off to one request every 5s and giving up after 10 minutes
+      let job = response.data;
+      let delay = 1000;
+      const deadline = Date.now() + 10 * 60 * 1000;
+      while (job.status !== 'COMPLETED' && job.status !== 'FAILED') {
+        if (Date.now() > deadline) {
+          setError('Still processing. The statement will show up in your list once it is done.');
+          onUploadSuccess(statementId);
+          return;
+        }
+        setProgress(job);
+        await new Promise((resolve) => setTimeout(resolve, delay));
+        delay = Math.min(delay * 1.5, 5000);
+        job = (await statementAPI.status(statementId)).data;
+      }
+
+      if (job.status === 'FAILED') {
+        setError(job.error || 'Processing failed');
+        return;
+      }
+
+      if (response.data.duplicate) {
+        alert('This statement was already uploaded.');
+        onUploadSuccess(statementId);
+        onClose();
+        return;
+      }
+
+      const skipped = job.rows_duplicate ? ` Skipped ${job.rows_duplicate} already imported.` : '';
+      alert(`Successfully processed ${job.rows_inserted} transactions.${skipped}`);
+      onUploadSuccess(statementId);
       onClose();
     } catch (err) {
       setError(err.response?.data?.error || 'Upload failed');
     } finally {
       setUploading(false);
+      setProgress(null);
     }
   };
 
@@ -338,7 +372,7 @@ const UploadStatement = ({ onClose, onUploadSuccess }) => {
             disabled={uploading || !file}
             className="flex-1 bg-blue-600 hover:bg-blue-700 text-white font-semibold py-3 rounded-lg disabled:opacity-50"
           >
-            {uploading ? 'Uploading...' : 'Upload'}
+            {uploading ? (progress ? `${progress.status.toLowerCase()}... ${progress.rows_inserted || progress.rows_categorized || progress.rows_parsed} rows` : 'Uploading...') : 'Upload'}
           </button>
           <button
             onClick={onClose}
@@ -445,6 +479,7 @@ const Dashboard = ({ onLogout }) => {
   const [categoryBreakdown, setCategoryBreakdown] = useState([]);
   const [selectedCategory, setSelectedCategory] = useState('');
   const [categoryTransactions, setCategoryTransactions] = useState([]);
+  const [nextTransactionsPage, setNextTransactionsPage] = useState(null);
   const [recommendations, setRecommendations] = useState(null);
   const [loading, setLoading] = useState(true);
   const [showUpload, setShowUpload] = useState(false);
@@ -478,24 +513,19 @@ const Dashboard = ({ onLogout }) => {
       
       const params = statementId ? { statement_id: statementId } : {};
       
-      const [summaryRes, topCatRes, trendRes, weekdayRes, breakdownRes, recsRes] = await Promise.all([
-        dashboardAPI.getSummary(params),
-        dashboardAPI.getTopCategories(params),
-        dashboardAPI.getSpendingTrend(params),
-        dashboardAPI.getSpendingByWeekday(params),
-        dashboardAPI.getCategoryBreakdown(params),
-        dashboardAPI.getRecommendations(params),
-      ]);
-
-      setSummary(summaryRes.data);
-      setTopCategories(topCatRes.data);
-      setSpendingTrend(trendRes.data);
-      setWeekdaySpending(weekdayRes.data);
-      setCategoryBreakdown(breakdownRes.data);
-      setRecommendations(recsRes.data);
+      // All panels come back in one response
+      const { data } = await dashboardAPI.getDashboard(params);
+
+      setSummary(data.summary);
+      setTopCategories(data.top_categories);
+      setSpendingTrend(data.spending_trend);
+      setWeekdaySpending(data.spending_by_weekday);
+      setCategoryBreakdown(data.category_breakdown);
+      setRecommendations(data.recommendations);
       
       setSelectedCategory('');
       setCategoryTransactions([]);
+      setNextTransactionsPage(null);
     } catch (error) {
       console.error('Error loading dashboard:', error);
     } finally {
@@ -509,20 +539,33 @@ const Dashboard = ({ onLogout }) => {
     
     if (categoryId) {
       try {
-        const params = { category_id: categoryId };
+        const params = { category_id: categoryId, fields: 'id,date,description,amount' };
         
         if (selectedStatementId) {
           params.statement_id = selectedStatementId;
         }
         
         const response = await transactionAPI.list(params);
-        setCategoryTransactions(response.data);
+        setCategoryTransactions(response.data.results);
+        setNextTransactionsPage(response.data.next);
       } catch (error) {
         console.error('Error loading transactions:', error);
         setCategoryTransactions([]);
+        setNextTransactionsPage(null);
       }
     } else {
       setCategoryTransactions([]);
+      setNextTransactionsPage(null);
+    }
+  };
+
+  const loadMoreTransactions = async () => {
+    try {
+      const response = await transactionAPI.page(nextTransactionsPage);
+      setCategoryTransactions((previous) => [...previous, ...response.data.results]);
+      setNextTransactionsPage(response.data.next);
+    } catch (error) {
+      console.error('Error loading transactions:', error);
     }
   };
 
@@ -817,6 +860,14 @@ const Dashboard = ({ onLogout }) => {
                     ))}
                   </tbody>
                 </table>
+                {nextTransactionsPage && (
+                  <button
+                    onClick={loadMoreTransactions}
+                    className="mt-4 px-4 py-2 text-sm font-medium text-blue-600 hover:text-blue-800"
+                  >
+                    Load more
+                  </button>
+                )}
               </div>
             )}
             
@@ -86,12 +86,15 @@ export const statementAPI = {
     });
   },
   get: (id) => api.get(`/statements/${id}/`),
+  status: (id) => api.get(`/statements/${id}/status/`),
   delete: (id) => api.delete(`/statements/${id}/`),
 };
 
 // Transaction API
 export const transactionAPI = {
   list: (params) => api.get('/transactions/', { params }),
+  // Follows the `next` link of a previous page
+  page: (url) => api.get(url),
   get: (id) => api.get(`/transactions/${id}/`),
 };
 
@@ -102,6 +105,7 @@ export const categoryAPI = {
 
 // Dashboard API
 export const dashboardAPI = {
+  getDashboard: (params) => api.get('/dashboard/', { params }),
   getSummary: (params) => api.get('/dashboard/summary/', { params }),
   getCategoryBreakdown: (params) => api.get('/dashboard/category-breakdown/', { params }),
   getTopCategories: (params) => api.get('/dashboard/top-categories/', { params }),